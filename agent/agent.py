@@ -1,25 +1,52 @@
 import os
+from dataclasses import replace
+from typing import Optional
 
-from pydantic_ai import Agent
+from pydantic_ai import Agent, RunContext
+from pydantic_ai.tools import ToolDefinition
 
 from agent.context import AgentContext
-from agent.prompt import get_system_prompt
+from agent.prompt import get_approximate_prompt, get_session_tables_prompt, get_system_prompt
 from agent.tools.query_data import query_data
 from agent.tools.visualize import visualize
 
 
+def model_name() -> str:
+    """Model configured by the MODEL env var (PydanticAI format)."""
+    return os.getenv("MODEL", "anthropic:claude-haiku-4-5-20251001")
+
+
+async def prepare_query_data(
+    ctx: RunContext[AgentContext], tool_def: ToolDefinition
+) -> Optional[ToolDefinition]:
+    """Offer the approximate parameter only when some dataset is sampled."""
+    if ctx.deps.samples:
+        return tool_def
+    schema = dict(tool_def.parameters_json_schema)
+    schema["properties"] = {
+        k: v for k, v in schema.get("properties", {}).items() if k != "approximate"
+    }
+    return replace(tool_def, parameters_json_schema=schema)
+
+
 def create_agent(dataset_info: str) -> Agent[AgentContext]:
     """Create the data analysis agent with query and visualization tools."""
-    model = os.getenv("MODEL", "anthropic:claude-haiku-4-5-20251001")
-
     agent: Agent[AgentContext] = Agent(
-        model=model,
+        model=model_name(),
         deps_type=AgentContext,
         system_prompt=get_system_prompt(dataset_info),
         retries=3,
     )
 
-    agent.tool(query_data)
+    agent.tool(query_data, prepare=prepare_query_data)
     agent.tool(visualize)
 
+    @agent.instructions
+    def session_tables(ctx: RunContext[AgentContext]) -> str:
+        return get_session_tables_prompt(ctx.deps.tables)
+
+    @agent.instructions
+    def approximate_mode(ctx: RunContext[AgentContext]) -> str:
+        return get_approximate_prompt(ctx.deps.samples)
+
     return agent
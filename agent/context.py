@@ -1,8 +1,31 @@
+import os
+import re
 from dataclasses import dataclass, field
 from typing import Optional
 
 import pandas as pd
 
+# Limits for session tables saved with query_data(save_as=...)
+MAX_SESSION_TABLES = int(os.getenv("MAX_SESSION_TABLES", "8"))
+MAX_SESSION_TABLES_MB = float(os.getenv("MAX_SESSION_TABLES_MB", "256"))
+# Query results kept per session for visualize(result_id=...)
+MAX_QUERY_RESULTS = int(os.getenv("MAX_QUERY_RESULTS", "16"))
+
+_TABLE_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]{0,62}$")
+
+
+def frame_bytes(df: pd.DataFrame) -> int:
+    """Approximate in-memory size of a DataFrame."""
+    return int(df.memory_usage(deep=True).sum())
+
+
+@dataclass
+class DatasetSample:
+    """Uniform random sample of a dataset, used for approximate queries."""
+
+    df: pd.DataFrame
+    fraction: float
+
 
 @dataclass
 class AgentContext:
@@ -10,4 +33,79 @@ class AgentContext:
 
     datasets: dict[str, pd.DataFrame] = field(default_factory=dict)
     dataset_info: str = ""
+    # Most recent query result
     current_dataframe: Optional[pd.DataFrame] = None
+    # Query results keyed by tool call id, oldest first
+    results: dict[str, pd.DataFrame] = field(default_factory=dict)
+    # Named intermediate results, least recently used first
+    tables: dict[str, pd.DataFrame] = field(default_factory=dict)
+    # Samples of large datasets, shared across sessions
+    samples: dict[str, DatasetSample] = field(default_factory=dict)
+    # Directory visualize writes files to
+    output_dir: str = "output"
+    # Approximate queries awaiting an exact rerun, keyed by tool call id
+    refinements: dict[str, str] = field(default_factory=dict)
+    # 95% margins of approximate results, keyed by tool call id
+    margins: dict[str, pd.DataFrame] = field(default_factory=dict)
+
+    def sql_tables(self) -> dict[str, pd.DataFrame]:
+        """Tables visible to SQL: datasets plus session tables."""
+        return {**self.datasets, **self.tables}
+
+    def add_result(self, call_id: Optional[str], df: pd.DataFrame) -> None:
+        """Store a query result under its tool call id and make it current.
+
+        Each call gets its own slot, so concurrent queries in one model
+        response can't overwrite each other's results.
+        """
+        self.current_dataframe = df
+        if not call_id:
+            return
+        self.results.pop(call_id, None)
+        self.results[call_id] = df
+        while len(self.results) > MAX_QUERY_RESULTS:
+            del self.results[next(iter(self.results))]
+
+    def get_result(self, result_id: Optional[str] = None) -> Optional[pd.DataFrame]:
+        """A query result by tool call id, or the most recent one."""
+        if result_id is None:
+            return self.current_dataframe
+        return self.results.get(result_id)
+
+    def save_table(self, name: str, df: pd.DataFrame) -> list[str]:
+        """Store a session table, evicting least recently used ones to fit.
+
+        Returns the names of evicted tables. Raises ValueError if the name is
+        invalid or the table alone exceeds the size limit.
+        """
+        if not _TABLE_NAME.match(name):
+            raise ValueError(
+                f"Invalid table name '{name}'. Use letters, digits and underscores."
+            )
+        if name.lower() in {d.lower() for d in self.datasets}:
+            raise ValueError(f"'{name}' is a dataset name. Choose another table name.")
+
+        max_bytes = MAX_SESSION_TABLES_MB * 1024 * 1024
+        if frame_bytes(df) > max_bytes:
+            raise ValueError(
+                f"Result is too large to save ({frame_bytes(df) / 1024 / 1024:.1f} MB, "
+                f"limit {MAX_SESSION_TABLES_MB:.0f} MB). Aggregate or filter it first."
+            )
+
+        self.tables.pop(name, None)
+        self.tables[name] = df
+
+        evicted: list[str] = []
+        while len(self.tables) > MAX_SESSION_TABLES or (
+            sum(frame_bytes(t) for t in self.tables.values()) > max_bytes
+        ):
+            oldest = next(iter(self.tables))
+            del self.tables[oldest]
+            evicted.append(oldest)
+        return evicted
+
+    def touch_tables(self, sql: str) -> None:
+        """Mark session tables referenced in a query as recently used."""
+        for name in list(self.tables):
+            if re.search(rf"\b{re.escape(name)}\b", sql, re.IGNORECASE):
+                self.tables[name] = self.tables.pop(name)
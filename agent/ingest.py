@@ -0,0 +1,138 @@
+"""
+Memory-compact CSV ingestion.
+
+`pd.read_csv` stores every string as a Python object. Datasets are loaded
+once and shared by all sessions, so their string columns are stored
+compactly instead, in ways that keep SQL results unchanged when the frame
+is registered with `register_table`:
+
+- Low-cardinality strings (Yes/No flags, contract types, ...) become
+  categoricals. DuckDB would see them as ENUM columns, which come back as
+  integer codes inside LIST results (array_agg, list), so register_table
+  exposes them through a view that casts them to VARCHAR.
+- Other strings become Arrow-backed strings if pyarrow is installed, which
+  DuckDB sees as VARCHAR.
+
+Numeric columns keep their 64-bit types: DuckDB keeps the column type in
+arithmetic, so `price * 1.1` on a float32 column loses precision and
+`quantity * 100000` on an int32 column can overflow. Yes/No columns stay
+strings rather than bool, so `Churn = 'Yes'` keeps working.
+"""
+
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+
+import duckdb
+import pandas as pd
+
+# Set to 0 to load datasets with pandas' default dtypes
+COMPACT_DTYPES = os.getenv("COMPACT_DTYPES", "1") != "0"
+# String columns with at most this share of distinct values become categoricals
+CATEGORY_MAX_RATIO = 0.5
+# Prefix of the underlying frames behind register_table's VARCHAR views
+COMPACT_TABLE_PREFIX = "__compact_"
+
+
+@dataclass
+class MemoryReport:
+    """In-memory size of a dataset before and after dtype optimization."""
+
+    name: str
+    before: int
+    after: int
+    converted: dict[str, str]
+
+    def __str__(self) -> str:
+        saved = 1 - self.after / self.before if self.before else 0.0
+        return (
+            f"{self.name}: {self.before / 1024 / 1024:.2f} MB -> "
+            f"{self.after / 1024 / 1024:.2f} MB ({saved:.0%} smaller, "
+            f"{len(self.converted)} columns converted)"
+        )
+
+
+def dataset_name(path: Path) -> str:
+    """SQL table name for a CSV file."""
+    return re.sub(r"[^a-zA-Z0-9_]", "_", path.stem).strip("_").lower()
+
+
+def _string_storage() -> str:
+    """Arrow-backed string dtype, or "" if pyarrow isn't installed."""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return ""
+    return "string[pyarrow]"
+
+
+def _compact_strings(column: pd.Series, storage: str) -> pd.Series:
+    if column.dropna().map(type).ne(str).any():
+        # Mixed types: leave as-is so values aren't coerced to text
+        return column
+    if len(column) and column.nunique() <= CATEGORY_MAX_RATIO * len(column):
+        return column.astype("category")
+    if storage and column.dtype == object:
+        return column.astype(storage)
+    return column
+
+
+def optimize_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Return a copy of df with compact string columns."""
+    storage = _string_storage()
+    columns = {}
+    for name, column in df.items():
+        if pd.api.types.is_string_dtype(column) and not isinstance(
+            column.dtype, pd.CategoricalDtype
+        ):
+            columns[name] = _compact_strings(column, storage)
+        else:
+            columns[name] = column
+    return pd.DataFrame(columns, index=df.index)
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def register_table(conn: duckdb.DuckDBPyConnection, name: str, df: pd.DataFrame) -> None:
+    """Register a DataFrame with DuckDB, with categorical columns as VARCHAR.
+
+    Frames without categoricals are registered directly. Otherwise the frame
+    is registered under a prefixed name and `name` becomes a view casting
+    the categorical columns, so queries never see ENUM values.
+    """
+    categorical = [
+        column for column, dtype in df.dtypes.items() if isinstance(dtype, pd.CategoricalDtype)
+    ]
+    if not categorical:
+        conn.register(name, df)
+        return
+
+    compact = COMPACT_TABLE_PREFIX + name
+    conn.register(compact, df)
+    casts = ", ".join(
+        f"CAST({_quote(str(c))} AS VARCHAR) AS {_quote(str(c))}" for c in categorical
+    )
+    conn.execute(
+        f"CREATE OR REPLACE TEMP VIEW {_quote(name)} AS "
+        f"SELECT * REPLACE ({casts}) FROM {_quote(compact)}"
+    )
+
+
+def read_dataset(path: Path, name: str) -> tuple[pd.DataFrame, MemoryReport]:
+    """Read a CSV file with compact dtypes and report the memory saved."""
+    df = pd.read_csv(path)
+    compact = optimize_dtypes(df) if COMPACT_DTYPES else df
+    converted = {
+        str(column): str(compact[column].dtype)
+        for column in df.columns
+        if compact[column].dtype != df[column].dtype
+    }
+    return compact, MemoryReport(
+        name=name,
+        before=int(df.memory_usage(deep=True).sum()),
+        after=int(compact.memory_usage(deep=True).sum()),
+        converted=converted,
+    )
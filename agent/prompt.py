@@ -1,3 +1,10 @@
+import hashlib
+
+import pandas as pd
+
+from agent.context import DatasetSample
+
+
 def get_system_prompt(dataset_info: str) -> str:
     return f"""You are a data analyst assistant. You help users explore and visualize data by writing SQL queries and creating charts.
 
@@ -9,13 +16,19 @@ def get_system_prompt(dataset_info: str) -> str:
 
 You have 2 tools:
 
-1. **query_data(sql, description)** — Execute a SQL query against the available datasets.
+1. **query_data(sql, description, save_as=None)** — Execute a SQL query against the available datasets.
    - Table names in SQL correspond to the dataset names listed above.
    - Always use this tool first to explore or prepare data.
-   - The result DataFrame is stored automatically for visualization.
+   - The result DataFrame is stored automatically for visualization under the reported `Result id`.
+   - Independent queries can be issued together in one response; they run in parallel.
+   - Pass `save_as="name"` to keep the result as a session table. Later queries, in this turn or
+     following ones, can select from it by name instead of recomputing the same joins and filters.
+   - Queries are planned before they run: joins estimated to explode (e.g. a missing join
+     condition) are rejected, and very large raw results are truncated with a LIMIT.
 
-2. **visualize(code, title, result_type, description)** — Create a visualization from the last query result.
-   - The variable `df` contains the DataFrame from the last `query_data` call.
+2. **visualize(code, title, result_type, description, result_id=None)** — Create a visualization from a query result.
+   - The variable `df` contains the DataFrame from the last `query_data` call, or from the call whose
+     `Result id` you pass as `result_id`. Always pass `result_id` after running several queries.
    - Available libraries: `pd` (pandas), `px` (plotly.express), `go` (plotly.graph_objects).
    - For `result_type="figure"`: your code must create a `fig` variable (Plotly Figure).
    - For `result_type="table"`: your code must create a `result` variable (DataFrame).
@@ -27,6 +40,7 @@ You have 2 tools:
 3. **Query before visualize** — Always call `query_data` before `visualize`.
 4. **Be concise** — After completing the analysis, provide a brief insight. Do not recite raw data.
 5. **No imports** — `pd`, `px`, `go` are pre-loaded. Do not add import statements in your code.
+6. **Reuse session tables** — For multi-step analysis, save expensive intermediate results with `save_as` and query them afterwards.
 
 ## Visualization Best Practices
 
@@ -46,3 +60,35 @@ For each user question, follow this sequence:
 4. Call `visualize` to create the chart or table.
 5. Provide a concise insight based on the results (2-3 sentences max).
 """
+
+
+def get_prompt_version() -> str:
+    """Short hash of the system prompt template; changes whenever the prompt does."""
+    return hashlib.sha256(get_system_prompt("").encode()).hexdigest()[:12]
+
+
+def get_approximate_prompt(samples: dict[str, DatasetSample]) -> str:
+    """Describe approximate mode when some datasets are large enough to be sampled."""
+    if not samples:
+        return ""
+
+    names = ", ".join(f"**{name}**" for name in samples)
+    return (
+        "## Approximate Queries\n\n"
+        f"Large datasets ({names}) are sampled. Pass `approximate=True` to `query_data` for "
+        "exploratory COUNT, SUM and AVG aggregates on them: the query runs on the sample and returns estimates "
+        "with ± margins immediately. Do not use it when exact figures matter."
+    )
+
+
+def get_session_tables_prompt(tables: dict[str, pd.DataFrame]) -> str:
+    """Describe the session tables saved so far, for dynamic instructions."""
+    if not tables:
+        return ""
+
+    lines = [
+        f"- **{name}** ({df.shape[0]} rows, {df.shape[1]} columns)\n"
+        f"  Columns: {', '.join(str(c) for c in df.columns)}"
+        for name, df in tables.items()
+    ]
+    return "## Session Tables\n\nSaved by earlier queries and available in SQL:\n\n" + "\n".join(lines)
@@ -0,0 +1,296 @@
+"""
+Approximate query execution over dataset samples.
+
+Large datasets get a uniform random sample at load time. An approximate
+query runs against the sample instead of the full table: COUNT and SUM
+columns are scaled up by the sampling fraction, and the query is re-run on
+disjoint slices of the sample to estimate a 95% error margin per value.
+
+Only simple aggregate queries are approximated: one SELECT over base tables
+(joins allowed) referencing exactly one sampled dataset, with at least one
+COUNT/SUM or average, COUNT/SUM only at the top of select expressions, no
+DISTINCT and no HAVING or QUALIFY filter (it would compare unscaled sample
+values). Row queries and aggregates a sample can't estimate (distinct
+counts, lists, histograms, products, ...) are excluded. Anything else
+returns None and the caller runs the query exactly. Margins are only
+reported for COUNT/SUM and for averages; extremes like MIN/MAX have no
+meaningful sampling margin, and a count of zero in the sample has none.
+"""
+
+import json
+import math
+import os
+import re
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import duckdb
+import numpy as np
+import pandas as pd
+
+from agent.context import AgentContext, DatasetSample
+from agent.ingest import register_table
+from agent.tools.query_guard import QueryCheck, run_checked
+
+# Datasets larger than this many rows get a sample of this size
+APPROX_SAMPLE_ROWS = int(os.getenv("APPROX_SAMPLE_ROWS", "10000"))
+# Disjoint sample slices used to estimate error margins
+APPROX_REPLICATES = 4
+
+_AGGREGATES = {
+    "count_star", "count", "sum", "fsum", "sumkahan", "avg", "mean", "min", "max",
+    "median", "mode", "quantile", "quantile_cont", "quantile_disc", "approx_quantile",
+    "stddev", "stddev_samp", "stddev_pop", "variance", "var_samp", "var_pop",
+    "corr", "covar_pop", "covar_samp", "first", "last", "any_value", "arg_min",
+    "arg_max", "bool_and", "bool_or", "entropy", "kurtosis", "skewness",
+}
+_SCALED = {"count_star", "count", "sum", "fsum", "sumkahan"}
+# Aggregates whose sampling error the slice spread estimates well
+_MEANS = {"avg", "mean"}
+
+
+class _Unsupported(Exception):
+    """The query shape can't be approximated safely."""
+
+
+@dataclass
+class ApproximateResult:
+    """Result of a query run on a dataset sample."""
+
+    df: Optional[pd.DataFrame]
+    check: QueryCheck
+    dataset: str
+    sample: DatasetSample
+    total_rows: int
+    # 95% margins for aggregate columns, aligned with df (NaN if unknown)
+    margins: Optional[pd.DataFrame] = None
+
+
+def build_samples(
+    datasets: dict[str, pd.DataFrame],
+    sample_rows: int = APPROX_SAMPLE_ROWS,
+    seed: int = 0,
+) -> dict[str, DatasetSample]:
+    """Draw a uniform sample of every dataset larger than sample_rows."""
+    samples: dict[str, DatasetSample] = {}
+    for name, df in datasets.items():
+        if len(df) <= sample_rows:
+            continue
+        # Keep the original row order so time series stay ordered
+        sample_df = df.sample(n=sample_rows, random_state=seed).sort_index()
+        samples[name] = DatasetSample(df=sample_df, fraction=sample_rows / len(df))
+    return samples
+
+
+def _walk(node: Any) -> list[dict[str, Any]]:
+    """All expression dicts nested in a serialized SQL node."""
+    found: list[dict[str, Any]] = []
+    if isinstance(node, dict):
+        found.append(node)
+        for value in node.values():
+            found.extend(_walk(value))
+    elif isinstance(node, list):
+        for value in node:
+            found.extend(_walk(value))
+    return found
+
+
+def _function_names(expr: Any) -> list[str]:
+    names = []
+    for node in _walk(expr):
+        if node.get("class") in ("WINDOW", "SUBQUERY"):
+            raise _Unsupported
+        if node.get("class") == "FUNCTION":
+            names.append(str(node.get("function_name", "")).lower())
+    return names
+
+
+def _base_tables(from_table: dict[str, Any]) -> set[str]:
+    kind = from_table.get("type")
+    if kind == "BASE_TABLE":
+        return {from_table["table_name"].lower()}
+    if kind == "JOIN":
+        return _base_tables(from_table["left"]) | _base_tables(from_table["right"])
+    raise _Unsupported
+
+
+def _column_kinds(sql: str, dataset: str) -> Optional[list[str]]:
+    """Classify each output column as 'key', 'scale' (COUNT/SUM), 'mean' or 'stat'.
+
+    Returns None if the query can't be approximated safely.
+    """
+    with duckdb.connect(database=":memory:") as conn:
+        serialized = json.loads(conn.execute("SELECT json_serialize_sql(?)", [sql]).fetchone()[0])
+        aggregates = {
+            row[0]
+            for row in conn.execute(
+                "SELECT DISTINCT function_name FROM duckdb_functions() "
+                "WHERE function_type = 'aggregate'"
+            ).fetchall()
+        }
+
+    if serialized.get("error") or len(serialized.get("statements", [])) != 1:
+        return None
+    node = serialized["statements"][0]["node"]
+
+    try:
+        if node.get("type") != "SELECT_NODE" or node.get("cte_map", {}).get("map"):
+            raise _Unsupported
+        if dataset not in _base_tables(node["from_table"]):
+            raise _Unsupported
+        # Filters on aggregates would see unscaled sample values
+        if node.get("having") or node.get("qualify"):
+            raise _Unsupported
+        # DISTINCT rows of a sample are a fraction of the real ones
+        if any(m.get("type") == "DISTINCT_MODIFIER" for m in node.get("modifiers", [])):
+            raise _Unsupported
+
+        kinds: list[str] = []
+        for expr in node["select_list"]:
+            if expr.get("class") == "STAR":
+                raise _Unsupported
+            names = _function_names(expr)
+            # Aggregates not listed, like distinct counts or lists, don't
+            # scale from a sample
+            if set(names) & aggregates - _AGGREGATES:
+                raise _Unsupported
+            top = str(expr.get("function_name", "")).lower()
+            if expr.get("class") == "FUNCTION" and top in _SCALED:
+                if expr.get("distinct") or _SCALED & set(names[1:]):
+                    raise _Unsupported
+                kinds.append("scale")
+            elif _SCALED & set(names):
+                # e.g. ROUND(SUM(x)) or SUM(x) / COUNT(*): scaling is ambiguous
+                raise _Unsupported
+            elif _AGGREGATES & set(names) and _AGGREGATES & set(names) <= _MEANS:
+                kinds.append("mean")
+            elif _AGGREGATES & set(names):
+                kinds.append("stat")
+            else:
+                kinds.append("key")
+        # Row queries return a fraction of the rows with nothing to scale
+        if not {"scale", "mean"} & set(kinds):
+            raise _Unsupported
+        return kinds
+    except _Unsupported:
+        return None
+
+
+def _scale(df: pd.DataFrame, kinds: list[str], factor: float) -> pd.DataFrame:
+    df = df.copy()
+    for column, kind in zip(df.columns, kinds):
+        if kind != "scale" or not pd.api.types.is_numeric_dtype(df[column]):
+            continue
+        if pd.api.types.is_integer_dtype(df[column]):
+            df[column] = (df[column] * factor).round().astype("int64")
+        else:
+            df[column] = df[column] * factor
+    return df
+
+
+def _margins(
+    df: pd.DataFrame,
+    replicates: list[pd.DataFrame],
+    kinds: list[str],
+) -> pd.DataFrame:
+    """Estimate 95% margins from the spread of per-slice results."""
+    keys = [c for c, kind in zip(df.columns, kinds) if kind == "key"]
+    values = [
+        c for c, kind in zip(df.columns, kinds)
+        if kind in ("scale", "mean") and pd.api.types.is_numeric_dtype(df[c])
+    ]
+    margins = pd.DataFrame(np.nan, index=df.index, columns=values)
+    if not values or df.empty or len(replicates) < 2:
+        return margins
+    # Slices are matched to result rows by key columns, which must be unique
+    if (keys and df.duplicated(keys).any()) or (not keys and len(df) != 1):
+        return margins
+
+    aligned = []
+    for replicate in replicates:
+        if keys:
+            index = df.set_index(keys).index
+            replicate = replicate.drop_duplicates(keys).set_index(keys).reindex(index)
+        aligned.append(replicate.head(len(df)))
+
+    scaled = {c for c, kind in zip(df.columns, kinds) if kind == "scale"}
+    for column in values:
+        stacked = np.column_stack([
+            pd.to_numeric(r[column], errors="coerce").to_numpy(dtype=float) for r in aligned
+        ])
+        std = np.std(stacked, axis=1, ddof=1)
+        complete = ~np.isnan(stacked).any(axis=1)
+        # A zero count only says the sample had no matching rows
+        observed = pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=float) != 0
+        if column not in scaled:
+            observed[:] = True
+        margins[column] = np.where(
+            complete & observed, 1.96 * std / math.sqrt(len(aligned)), np.nan
+        )
+    return margins
+
+
+def run_approximate(context: AgentContext, sql: str) -> Optional[ApproximateResult]:
+    """Run a query on the sample of the dataset it reads.
+
+    Returns None when the query doesn't qualify, so the caller runs it exactly.
+    """
+    sampled = [
+        name for name in context.samples
+        if re.search(rf"\b{re.escape(name)}\b", sql, re.IGNORECASE)
+    ]
+    if len(sampled) != 1:
+        return None
+
+    dataset = sampled[0]
+    kinds = _column_kinds(sql, dataset)
+    if kinds is None:
+        return None
+
+    sample = context.samples[dataset]
+    tables = context.sql_tables()
+    total_rows = len(tables[dataset])
+
+    with duckdb.connect(database=":memory:") as conn:
+        for name, table in tables.items():
+            register_table(conn, name, table)
+
+        register_table(conn, dataset, sample.df)
+        df, check = run_checked(conn, sql, {**tables, dataset: sample.df})
+        if df is None:
+            return ApproximateResult(df, check, dataset, sample, total_rows)
+        if len(df.columns) != len(kinds):
+            return None
+        df = _scale(df, kinds, 1 / sample.fraction)
+
+        # Re-run on disjoint slices of the sample to measure the spread
+        replicates = []
+        for i in range(APPROX_REPLICATES):
+            part = sample.df.iloc[i::APPROX_REPLICATES]
+            register_table(conn, dataset, part)
+            replicate, _ = run_checked(conn, sql, {**tables, dataset: part})
+            if replicate is None:
+                break
+            replicates.append(_scale(replicate, kinds, len(sample.df) / len(part) / sample.fraction))
+
+    return ApproximateResult(
+        df=df,
+        check=check,
+        dataset=dataset,
+        sample=sample,
+        total_rows=total_rows,
+        margins=_margins(df, replicates, kinds),
+    )
+
+
+def format_with_margins(df: pd.DataFrame, margins: Optional[pd.DataFrame]) -> pd.DataFrame:
+    """Render aggregate values as 'value ± margin' for previews."""
+    if margins is None:
+        return df
+    shown = df.copy()
+    for column in margins.columns:
+        shown[column] = [
+            f"{value:.4g} ± {margin:.2g}" if pd.notna(margin) else f"{value:.4g}"
+            for value, margin in zip(df[column], margins[column])
+        ]
+    return shown
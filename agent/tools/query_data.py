@@ -1,39 +1,110 @@
-import duckdb
+import asyncio
+from typing import Optional
+
 from pydantic_ai import RunContext
 
 from agent.context import AgentContext
+from agent.tools.approximate import format_with_margins, run_approximate
+from agent.tools.query_guard import run_guarded
 
 
 async def query_data(
     ctx: RunContext[AgentContext],
     sql: str,
     description: str,
+    save_as: Optional[str] = None,
+    approximate: bool = False,
 ) -> str:
     """Execute a SQL query against the loaded datasets.
 
     Args:
         ctx: Injected context with loaded datasets.
-        sql: SQL query to execute. Table names correspond to dataset names.
+        sql: SQL query to execute. Table names correspond to dataset names
+             and to session tables saved by earlier queries.
         description: Short description of what this query does.
+        save_as: Optional name to keep the result as a session table that
+                 later queries can reference, e.g. for multi-step analysis.
+        approximate: Run on a sample of large datasets for a fast estimate
+                     with error margins. Use for exploratory COUNT, SUM
+                     and AVG aggregates.
     """
     if not ctx.deps.datasets:
         return "Error: No datasets loaded."
 
     try:
-        with duckdb.connect(database=":memory:") as conn:
-            for name, df in ctx.deps.datasets.items():
-                conn.register(name, df)
-            result_df = conn.execute(sql).fetchdf()
+        ctx.deps.touch_tables(sql)
+        call_id = getattr(ctx, "tool_call_id", None)
+
+        # DuckDB runs in a worker thread so queries issued together in one
+        # model response execute in parallel
+        approx = None
+        # Session tables must hold exact data, so never save an estimate
+        if approximate and not save_as:
+            approx = await asyncio.to_thread(run_approximate, ctx.deps, sql)
+        if approx is not None:
+            result_df, check = approx.df, approx.check
+        else:
+            result_df, check = await asyncio.to_thread(run_guarded, ctx.deps.sql_tables(), sql)
+
+        if result_df is None:
+            return f"Error: {check.error}"
+        # A truncated result would silently skew every query on the table
+        if save_as and check.limited_to:
+            return (
+                f"Error: Not saved as session table {save_as}: the result was limited to "
+                f"{check.limited_to:,} of ~{check.estimated_rows:,} estimated rows. "
+                f"Aggregate or filter in SQL so the table holds the full data."
+            )
+
+        ctx.deps.add_result(call_id, result_df)
 
-        ctx.deps.current_dataframe = result_df
+        if approx is not None:
+            preview_df = format_with_margins(result_df, approx.margins)
+            header = (
+                f"Approximate result from a {approx.sample.fraction:.1%} sample of "
+                f"{approx.dataset} ({len(approx.sample.df):,} of {approx.total_rows:,} rows). "
+                f"COUNT/SUM values are scaled up; ± values are approximate 95% margins.\n"
+            )
+            if call_id:
+                ctx.deps.refinements[call_id] = sql
+                if approx.margins is not None:
+                    ctx.deps.margins[call_id] = approx.margins
+        else:
+            preview_df = result_df
+            header = "Query executed successfully.\n"
 
-        preview = result_df.head(5).to_string(index=False)
+        preview = preview_df.head(5).to_string(index=False)
+        result_id = f"Result id: {call_id}\n" if call_id else ""
         summary = (
-            f"Query executed successfully.\n"
+            f"{header}"
             f"Result: {result_df.shape[0]} rows x {result_df.shape[1]} columns\n"
             f"Columns: {', '.join(result_df.columns.tolist())}\n"
+            f"{result_id}"
             f"Preview:\n{preview}"
         )
+
+        if approximate and approx is None:
+            summary += (
+                "\nNote: Computed exactly. Approximate mode only applies to simple "
+                "COUNT/SUM/AVG queries over one large, sampled dataset."
+            )
+
+        if check.limited_to:
+            summary += (
+                f"\nNote: Result limited to the first {check.limited_to:,} of "
+                f"~{check.estimated_rows:,} estimated rows. Aggregate or filter in SQL "
+                f"to work with the full data."
+            )
+
+        if save_as:
+            try:
+                evicted = ctx.deps.save_table(save_as, result_df)
+            except ValueError as e:
+                return f"Error saving session table: {e}"
+            summary += f"\nSaved as session table: {save_as}"
+            if evicted:
+                summary += f"\nEvicted session tables: {', '.join(evicted)}"
+
         return summary
 
     except Exception as e:
@@ -0,0 +1,327 @@
+"""
+Pre-execution guard for LLM-written SQL.
+
+Runs DuckDB `EXPLAIN` before a query executes to estimate its cardinality,
+rejects plans that would blow up (joins without a usable condition, or on
+low-cardinality columns) and caps very large raw results with a LIMIT, so
+bad queries fail in milliseconds instead of after a full execution.
+"""
+
+import json
+import math
+import os
+import weakref
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+import duckdb
+import pandas as pd
+
+from agent.ingest import register_table
+
+# Joins estimated above this many rows are rejected before execution
+QUERY_MAX_JOIN_ROWS = int(os.getenv("QUERY_MAX_JOIN_ROWS", "10000000"))
+# Results estimated above this many rows get an automatic LIMIT
+QUERY_MAX_RESULT_ROWS = int(os.getenv("QUERY_MAX_RESULT_ROWS", "100000"))
+
+# Joins whose output DuckDB does not bound by key matches: the product of the
+# inputs is used as their estimate.
+_PRODUCT_JOINS = {
+    "CROSS_PRODUCT",
+    "NESTED_LOOP_JOIN",
+    "BLOCKWISE_NL_JOIN",
+    "PIECEWISE_MERGE_JOIN",
+}
+# Hash joins that can return more rows than their inputs
+_ROW_JOINS = {"INNER", "LEFT", "RIGHT", "OUTER", "FULL"}
+_LIMITS = {"LIMIT", "STREAMING_LIMIT", "LIMIT_PERCENT", "TOP_N"}
+_STREAMING_LIMITS = {"LIMIT", "STREAMING_LIMIT"}
+# Operators whose output size doesn't follow from their input size
+_REDUCING = ("AGGREGATE", "GROUP_BY", "DISTINCT", "LIMIT", "TOP_N", "SAMPLE")
+# Operators that consume their whole input before producing output
+_BLOCKING = ("AGGREGATE", "GROUP_BY", "ORDER", "TOP_N", "WINDOW", "DISTINCT")
+
+
+@dataclass
+class PlanNode:
+    """One operator of a DuckDB physical plan."""
+
+    name: str
+    cardinality: Optional[int]
+    children: list["PlanNode"] = field(default_factory=list)
+    join_type: str = ""
+    # Join conditions such as "gender = gender"
+    conditions: list[str] = field(default_factory=list)
+
+    @classmethod
+    def from_json(cls, data: dict[str, Any]) -> "PlanNode":
+        extra = data.get("extra_info", {})
+        raw = extra.get("Estimated Cardinality")
+        try:
+            cardinality = int(raw) if raw is not None else None
+        except (TypeError, ValueError):
+            cardinality = None
+        conditions = extra.get("Conditions", [])
+        return cls(
+            name=data.get("name", "").strip().upper(),
+            cardinality=cardinality,
+            children=[cls.from_json(c) for c in data.get("children", [])],
+            join_type=str(extra.get("Join Type", "")).upper(),
+            conditions=[conditions] if isinstance(conditions, str) else list(conditions),
+        )
+
+
+@dataclass
+class QueryCheck:
+    """Outcome of checking a query plan."""
+
+    sql: str
+    estimated_rows: Optional[int] = None
+    limited_to: Optional[int] = None
+    error: Optional[str] = None
+
+
+def explain(conn: duckdb.DuckDBPyConnection, sql: str) -> Optional[PlanNode]:
+    """Return the physical plan of a query, or None if it can't be explained."""
+    try:
+        rows = conn.execute(f"EXPLAIN (FORMAT JSON) {sql}").fetchall()
+    except duckdb.Error:
+        # Older DuckDB versions or statements EXPLAIN does not support
+        return None
+
+    for row in rows:
+        # Multi-statement SQL returns the last statement's rows instead of a plan
+        if len(row) != 2:
+            return None
+        key, value = row
+        if key == "physical_plan":
+            nodes = json.loads(value)
+            return PlanNode.from_json(nodes[0]) if nodes else None
+    return None
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+# Approximate distinct counts by DataFrame id and column. Datasets are
+# shared and don't change within a catalog version, so each column is
+# counted once; entries are dropped when their frame is garbage collected.
+_distinct_counts: dict[int, dict[str, Optional[int]]] = {}
+
+
+def _frame_counts(df: pd.DataFrame) -> dict[str, Optional[int]]:
+    counts: dict[str, Optional[int]] = {}
+    cached = _distinct_counts.setdefault(id(df), counts)
+    if cached is counts:
+        weakref.finalize(df, _distinct_counts.pop, id(df), None)
+    return cached
+
+
+def _read_tables(conn: duckdb.DuckDBPyConnection, sql: str) -> set[str]:
+    """Names of the tables a query reads (lowercase), or an empty set."""
+    try:
+        serialized = json.loads(
+            conn.execute("SELECT json_serialize_sql(?)", [sql]).fetchone()[0]
+        )
+    except duckdb.Error:
+        return set()
+
+    names: set[str] = set()
+    pending: list[Any] = [serialized.get("statements", [])]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, dict):
+            if node.get("type") == "BASE_TABLE" and node.get("table_name"):
+                names.add(str(node["table_name"]).lower())
+            pending.extend(node.values())
+        elif isinstance(node, list):
+            pending.extend(node)
+    return names
+
+
+def _distinct_counter(
+    conn: duckdb.DuckDBPyConnection,
+    sql: str,
+    tables: dict[str, pd.DataFrame],
+) -> Callable[[str], Optional[int]]:
+    """Approximate distinct counts of a column name, looked up on demand.
+
+    Plans don't say which table a join column comes from, so the count is
+    the largest among the tables the query reads that have a column of
+    that name (the lowest join estimate). Returns None for expressions and
+    unknown columns.
+    """
+    read = _read_tables(conn, sql)
+    frames = {name: df for name, df in tables.items() if name.lower() in read}
+
+    def distinct(column: str) -> Optional[int]:
+        found = []
+        for name, df in frames.items():
+            if column not in df.columns:
+                continue
+            counts = _frame_counts(df)
+            if column not in counts:
+                counts[column] = conn.execute(
+                    f"SELECT approx_count_distinct({_quote(column)}) FROM {_quote(name)}"
+                ).fetchone()[0]
+            found.append(counts[column])
+        return max(found) if found else None
+
+    return distinct
+
+
+def _key_join_estimate(
+    node: PlanNode,
+    children: list[int],
+    distinct: Optional[Callable[[str], Optional[int]]],
+) -> Optional[int]:
+    """Estimate an equi-join as |left| * |right| / distinct keys.
+
+    DuckDB's own estimates for joins on registered DataFrames ignore key
+    cardinality, so a self join on a two-valued column is estimated at the
+    input size instead of n²/2.
+    """
+    if (
+        distinct is None
+        or node.name != "HASH_JOIN"
+        or node.join_type not in _ROW_JOINS
+        or len(children) != 2
+        or not node.conditions
+    ):
+        return None
+
+    keys = 1
+    for condition in node.conditions:
+        left, op, right = condition.partition(" = ")
+        if not op:
+            return None
+        counts = [distinct(left.strip()), distinct(right.strip())]
+        if None in counts:
+            return None
+        keys *= max(max(counts), 1)
+    return math.prod(children) // keys
+
+
+def _estimate(
+    node: PlanNode,
+    joins: list[tuple[str, int]],
+    distinct: Optional[Callable[[str], Optional[int]]] = None,
+) -> int:
+    """Estimate output rows of a node, collecting join estimates on the way."""
+    children = [_estimate(child, joins, distinct) for child in node.children]
+    keyed = _key_join_estimate(node, children, distinct)
+
+    if node.name in _PRODUCT_JOINS:
+        estimate = max(math.prod(children), node.cardinality or 0)
+    elif keyed is not None:
+        estimate = max(keyed, node.cardinality or 0)
+    elif node.name == "UNGROUPED_AGGREGATE":
+        estimate = 1
+    elif len(node.children) == 1 and not any(op in node.name for op in _REDUCING):
+        # Apply DuckDB's selectivity to our input estimate, which can be far
+        # larger than DuckDB's own after a join
+        child = node.children[0]
+        ratio = 1.0
+        if node.cardinality is not None and child.cardinality:
+            ratio = min(node.cardinality / child.cardinality, 1.0)
+        estimate = round(children[0] * ratio)
+    elif node.cardinality is not None:
+        estimate = node.cardinality
+    else:
+        estimate = max(children, default=0)
+
+    if "JOIN" in node.name or node.name == "CROSS_PRODUCT":
+        joins.append((node.name, estimate))
+    return estimate
+
+
+def _output_node(node: PlanNode) -> PlanNode:
+    """Skip the projections at the top of a plan."""
+    while node.name == "PROJECTION" and len(node.children) == 1:
+        node = node.children[0]
+    return node
+
+
+def _has_limit(node: PlanNode) -> bool:
+    """True if the query output is already bounded by a LIMIT."""
+    return _output_node(node).name in _LIMITS
+
+
+def _is_blocking(node: PlanNode) -> bool:
+    return any(op in node.name for op in _BLOCKING) or any(
+        _is_blocking(child) for child in node.children
+    )
+
+
+def _stops_early(node: PlanNode) -> bool:
+    """True if a LIMIT stops execution early, so large joins below it are cheap."""
+    output = _output_node(node)
+    return output.name in _STREAMING_LIMITS and not _is_blocking(output)
+
+
+def check_query(
+    conn: duckdb.DuckDBPyConnection,
+    sql: str,
+    tables: dict[str, pd.DataFrame],
+) -> QueryCheck:
+    """Check a query against the guard limits before running it.
+
+    tables are the frames registered on conn, by name. Returns the SQL to execute, with a LIMIT applied if the result would be
+    too large to be useful, or an actionable error for explosive plans.
+    """
+    plan = explain(conn, sql)
+    if plan is None:
+        return QueryCheck(sql=sql)
+
+    joins: list[tuple[str, int]] = []
+    estimated_rows = _estimate(plan, joins, _distinct_counter(conn, sql, tables))
+
+    worst = max(joins, key=lambda j: j[1], default=None)
+    if worst and worst[1] > QUERY_MAX_JOIN_ROWS and not _stops_early(plan):
+        return QueryCheck(
+            sql=sql,
+            estimated_rows=estimated_rows,
+            error=(
+                f"Query rejected before execution: {worst[0]} is estimated to produce "
+                f"~{worst[1]:,} rows (limit {QUERY_MAX_JOIN_ROWS:,}). This usually means a "
+                f"missing or non-selective join condition. Join on key columns, or "
+                f"filter/aggregate each table before joining."
+            ),
+        )
+
+    if estimated_rows > QUERY_MAX_RESULT_ROWS and not _has_limit(plan):
+        base = sql.strip().rstrip(";")
+        return QueryCheck(
+            # Newlines keep a trailing SQL comment from swallowing the wrapper
+            sql=f"SELECT * FROM (\n{base}\n) AS limited_result LIMIT {QUERY_MAX_RESULT_ROWS}",
+            estimated_rows=estimated_rows,
+            limited_to=QUERY_MAX_RESULT_ROWS,
+        )
+
+    return QueryCheck(sql=sql, estimated_rows=estimated_rows)
+
+
+def run_checked(
+    conn: duckdb.DuckDBPyConnection,
+    sql: str,
+    tables: dict[str, pd.DataFrame],
+) -> tuple[Optional[pd.DataFrame], QueryCheck]:
+    """Check the query plan and run it on a connection with tables registered.
+
+    Returns (None, check) if the plan check rejected the query.
+    """
+    check = check_query(conn, sql, tables)
+    if check.error:
+        return None, check
+    return conn.execute(check.sql).fetchdf(), check
+
+
+def run_guarded(
+    tables: dict[str, pd.DataFrame], sql: str
+) -> tuple[Optional[pd.DataFrame], QueryCheck]:
+    """Register tables in a fresh connection, then check and run the query."""
+    with duckdb.connect(database=":memory:") as conn:
+        for name, df in tables.items():
+            register_table(conn, name, df)
+        return run_checked(conn, sql, tables)
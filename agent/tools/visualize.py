@@ -1,6 +1,6 @@
 import os
 import re
-from typing import Literal
+from typing import Literal, Optional
 
 import pandas as pd
 import plotly.express as px
@@ -16,8 +16,9 @@ async def visualize(
     title: str,
     result_type: Literal["figure", "table"],
     description: str,
+    result_id: Optional[str] = None,
 ) -> str:
-    """Create a visualization from the last query result.
+    """Create a visualization from a query result.
 
     Args:
         ctx: Injected context with current DataFrame.
@@ -28,12 +29,18 @@ async def visualize(
         title: Title of the visualization.
         result_type: Either "figure" (Plotly chart) or "table" (formatted DataFrame).
         description: Description of what this visualization shows.
+        result_id: Result id reported by query_data. Defaults to the last
+                   query result.
     """
-    if ctx.deps.current_dataframe is None:
+    df = ctx.deps.get_result(result_id)
+    if df is None:
+        if result_id is not None:
+            return (
+                f"Error: Unknown result_id '{result_id}'. Use a Result id reported by "
+                f"query_data, or run the query again."
+            )
         return "Error: No data available. Call query_data first."
 
-    df = ctx.deps.current_dataframe
-
     try:
         namespace = {
             "df": df.copy(),
@@ -44,14 +51,15 @@ async def visualize(
         exec(code, namespace)
 
         safe_title = re.sub(r"[^\w\s-]", "", title).strip().replace(" ", "_").lower()
-        os.makedirs("output", exist_ok=True)
+        output_dir = ctx.deps.output_dir
+        os.makedirs(output_dir, exist_ok=True)
 
         if result_type == "figure":
             fig = namespace.get("fig")
             if fig is None:
                 return "Error: Code must create a 'fig' variable (plotly Figure)."
 
-            filepath = f"output/{safe_title}.html"
+            filepath = f"{output_dir}/{safe_title}.html"
             fig.write_html(filepath)
 
             return (
@@ -64,7 +72,7 @@ async def visualize(
         elif result_type == "table":
             result = namespace.get("result", df)
 
-            filepath = f"output/{safe_title}.csv"
+            filepath = f"{output_dir}/{safe_title}.csv"
             result.to_csv(filepath, index=False)
 
             return (
@@ -3,9 +3,17 @@ FastAPI application for the Data Analysis Agent.
 
 Run with:
     uvicorn api.main:app --reload --port 8000
+
+Run with several workers (sessions shared through STATE_DIR):
+    SESSION_BACKEND=sqlite uvicorn api.main:app --workers 4 --port 8000
+
+Keep sessions in memory but snapshot them to STATE_DIR for restarts:
+    SESSION_BACKEND=snapshot uvicorn api.main:app --port 8000
 """
 
+import asyncio
 import logging
+import os
 import sys
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
@@ -29,15 +37,53 @@ from api.routes.files import router as files_router
 from api.services.session import session_manager
 
 
+SNAPSHOT_INTERVAL = float(os.getenv("SNAPSHOT_INTERVAL", "30"))
+CATALOG_CHECK_INTERVAL = float(os.getenv("CATALOG_CHECK_INTERVAL", "30"))
+
+
+async def snapshot_sessions(interval: float) -> None:
+    """Periodically write pending session snapshots to disk."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            flushed = await asyncio.to_thread(session_manager.flush_sessions)
+            if flushed:
+                logger.info(f"Snapshotted {flushed} sessions")
+        except Exception as e:
+            logger.exception(f"Session snapshot failed: {e}")
+
+
+async def watch_catalog(interval: float) -> None:
+    """Periodically compare this worker's datasets with the shared catalog."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(session_manager.sync_catalog)
+        except Exception as e:
+            logger.exception(f"Dataset catalog check failed: {e}")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     """Application lifespan: startup and shutdown."""
     # Startup: datasets are loaded by session_manager on import
-    logger.info(f"Loaded {len(session_manager.datasets)} datasets")
+    logger.info(
+        f"Loaded {len(session_manager.datasets)} datasets "
+        f"(catalog version {session_manager.catalog_version})"
+    )
+    for report in session_manager.memory_reports:
+        logger.info(f"Dataset memory: {report}")
     logger.info(f"Dataset info:\n{session_manager.dataset_info}")
+    snapshot_task = asyncio.create_task(snapshot_sessions(SNAPSHOT_INTERVAL))
+    catalog_task = asyncio.create_task(watch_catalog(CATALOG_CHECK_INTERVAL))
     yield
-    # Shutdown: cleanup if needed
+    # Shutdown: write a final snapshot so sessions survive the restart
     logger.info("Shutting down...")
+    snapshot_task.cancel()
+    catalog_task.cancel()
+    flushed = await asyncio.to_thread(session_manager.flush_sessions)
+    if flushed:
+        logger.info(f"Snapshotted {flushed} sessions")
 
 
 app = FastAPI(
@@ -1,22 +1,30 @@
 """Chat routes."""
 
-from typing import Optional
+import asyncio
+from typing import Annotated, Optional
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Header
 from fastapi.responses import StreamingResponse
 
-from api.services.chat import stream_agent_response
+from api.services.chat import stream_answer
 from api.services.session import session_manager
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
 
 @router.get("/stream")
-async def stream_chat(question: str, session_id: Optional[str] = None) -> StreamingResponse:
-    session = session_manager.get_or_create_session(session_id)
+async def stream_chat(
+    question: str,
+    session_id: Optional[str] = None,
+    x_answer_cache: Annotated[Optional[str], Header()] = None,
+) -> StreamingResponse:
+    # Loading a session may read the store and result files; keep it off the loop
+    session = await asyncio.to_thread(session_manager.get_or_create_session, session_id)
+    # "X-Answer-Cache: bypass" forces a fresh run (which refreshes the cache)
+    use_cache = (x_answer_cache or "").lower() != "bypass"
 
     return StreamingResponse(
-        stream_agent_response(session, question),
+        stream_answer(session, question, use_cache),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
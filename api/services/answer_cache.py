@@ -0,0 +1,234 @@
+"""
+Exact-match cache of first-turn answers.
+
+Dashboard-style users ask the same opening questions over and over. When
+enabled, the complete SSE event sequence of a first-turn run is stored
+together with the session state it produced and copies of the files it
+generated. A new session asking the same question gets the events replayed
+instantly instead of a full agent run.
+
+Entries are keyed on the normalized question, the model, the system prompt
+version and the dataset catalog version, so changing any of them misses the
+cache. The cache lives in each worker's memory; generated files are copied
+to STATE_DIR/answer_cache/<pid>. Directories of workers that are no longer
+running are removed when a worker starts.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+
+import pandas as pd
+
+from agent.agent import model_name
+from agent.context import frame_bytes
+from agent.prompt import get_prompt_version
+
+logger = logging.getLogger(__name__)
+
+# Generated files are served from here
+OUTPUT_DIR = Path("output")
+
+
+@dataclass
+class CachedAnswer:
+    """A first-turn run: its SSE events, resulting session state and files."""
+
+    events: list[str]
+    message_history: list[Any]
+    current_dataframe: Optional[pd.DataFrame]
+    tables: dict[str, pd.DataFrame]
+    # query_data call id -> result, for follow-up visualize(result_id=...)
+    results: dict[str, pd.DataFrame] = field(default_factory=dict)
+    # Generated file name -> copy in the cache directory
+    artifacts: dict[str, Path] = field(default_factory=dict)
+    created: float = field(default_factory=time.time)
+    size: int = 0
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    return re.sub(r"\s+", " ", question).strip().lower().rstrip("?!. ")
+
+
+def _process_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Running under another user
+    return True
+
+
+def _artifact_names(events: list[str]) -> list[str]:
+    """File names referenced by visualization events."""
+    names = []
+    for event in events:
+        if event.startswith("event: visualization\n"):
+            data = json.loads(event.split("data: ", 1)[1])
+            names.append(data["filename"])
+    return names
+
+
+class AnswerCache:
+    """In-memory LRU cache of first-turn answers with TTL and size limits.
+
+    Entries are stored from worker threads (put does file I/O) and read on
+    the event loop, so every access to them holds a lock.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = ".state/answer_cache",
+        ttl: float = 3600,
+        max_entries: int = 256,
+        max_mb: float = 512,
+    ):
+        self._entries: OrderedDict[str, CachedAnswer] = OrderedDict()
+        self._lock = threading.Lock()
+        # One directory per worker process, since each has its own entries
+        self._dir = Path(cache_dir) / str(os.getpid())
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._max_bytes = max_mb * 1024 * 1024
+        self._remove_stale_dirs()
+
+    def _remove_stale_dirs(self) -> None:
+        """Delete this worker's old directory and those of exited workers."""
+        shutil.rmtree(self._dir, ignore_errors=True)
+        if not self._dir.parent.is_dir():
+            return
+        for path in self._dir.parent.iterdir():
+            if path.is_dir() and path.name.isdigit() and not _process_running(int(path.name)):
+                logger.info(f"Removing cached answers of exited worker {path.name}")
+                shutil.rmtree(path, ignore_errors=True)
+
+    @staticmethod
+    def key(question: str, catalog_version: str) -> str:
+        """Cache key for a first-turn question."""
+        parts = [normalize_question(question), model_name(), get_prompt_version(), catalog_version]
+        return hashlib.sha256(json.dumps(parts).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[CachedAnswer]:
+        """Return a live entry and mark it recently used."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry.created > self._ttl:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(
+        self,
+        key: str,
+        events: list[str],
+        message_history: list[Any],
+        current_dataframe: Optional[pd.DataFrame],
+        tables: dict[str, pd.DataFrame],
+        results: dict[str, pd.DataFrame],
+    ) -> Optional[CachedAnswer]:
+        """Store a run, copying the files it generated.
+
+        Returns None if a generated file is missing, since the replay couldn't
+        serve it.
+        """
+        with self._lock:
+            self._remove(key)
+            entry_dir = self._dir / key
+            artifacts: dict[str, Path] = {}
+            for name in _artifact_names(events):
+                source = OUTPUT_DIR / Path(name).name
+                if not source.exists():
+                    shutil.rmtree(entry_dir, ignore_errors=True)
+                    return None
+                entry_dir.mkdir(parents=True, exist_ok=True)
+                artifacts[name] = Path(shutil.copy2(source, entry_dir / source.name))
+
+            # The current dataframe is usually also one of the results
+            frames = {id(f): f for f in [*tables.values(), *results.values()]}
+            if current_dataframe is not None:
+                frames[id(current_dataframe)] = current_dataframe
+            size = sum(len(e) for e in events) + sum(p.stat().st_size for p in artifacts.values())
+            size += sum(frame_bytes(f) for f in frames.values())
+
+            entry = CachedAnswer(
+                events=list(events),
+                message_history=list(message_history),
+                current_dataframe=current_dataframe,
+                tables=dict(tables),
+                results=dict(results),
+                artifacts=artifacts,
+                size=size,
+            )
+            self._entries[key] = entry
+            self._evict()
+            return self._entries.get(key)
+
+    def restore_artifacts(self, entry: CachedAnswer) -> bool:
+        """Copy an entry's files back to the output directory.
+
+        Returns False if a cached copy is gone, e.g. evicted by another thread.
+        """
+        try:
+            OUTPUT_DIR.mkdir(exist_ok=True)
+            for name, path in entry.artifacts.items():
+                shutil.copy2(path, OUTPUT_DIR / Path(name).name)
+        except OSError as e:
+            logger.warning(f"Cached answer files unavailable: {e}")
+            return False
+        return True
+
+    def invalidate(self, key: str) -> None:
+        """Drop an entry."""
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        """Drop an entry; the caller holds the lock."""
+        entry = self._entries.pop(key, None)
+        if entry is not None and entry.artifacts:
+            shutil.rmtree(self._dir / key, ignore_errors=True)
+
+    def _evict(self) -> None:
+        """Drop expired entries, then least recently used ones over the limits.
+
+        The caller holds the lock.
+        """
+        now = time.time()
+        for key in [k for k, e in self._entries.items() if now - e.created > self._ttl]:
+            self._remove(key)
+        while self._entries and (
+            len(self._entries) > self._max_entries
+            or sum(e.size for e in self._entries.values()) > self._max_bytes
+        ):
+            key = next(iter(self._entries))
+            logger.info(f"Evicting cached answer {key[:12]}")
+            self._remove(key)
+
+
+def create_answer_cache() -> Optional[AnswerCache]:
+    """Create the answer cache if ANSWER_CACHE is enabled."""
+    if os.getenv("ANSWER_CACHE", "false").lower() not in ("1", "true", "yes"):
+        return None
+    return AnswerCache(
+        cache_dir=str(Path(os.getenv("STATE_DIR", ".state")) / "answer_cache"),
+        ttl=float(os.getenv("ANSWER_CACHE_TTL", "3600")),
+        max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "256")),
+        max_mb=float(os.getenv("ANSWER_CACHE_MAX_MB", "512")),
+    )
+
+
+answer_cache = create_answer_cache()
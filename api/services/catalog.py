@@ -0,0 +1,136 @@
+"""
+Shared on-disk catalog of the loaded datasets.
+
+Each worker loads the CSV files itself, then publishes what it loaded to a
+JSON catalog in the shared state directory. The catalog version is a hash of
+the dataset names and file fingerprints, so every worker agrees on the same
+version (and prompt) as long as they loaded the same files. Workers check
+the published catalog periodically: one whose files on disk now match a newer
+published version reloads them, and one whose files differ logs a warning.
+"""
+
+import fcntl
+import hashlib
+import json
+import logging
+import os
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Iterator
+
+import pandas as pd
+
+from agent.ingest import dataset_name
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class DatasetEntry:
+    """Metadata of one dataset in the catalog."""
+
+    name: str
+    path: str
+    size: int
+    mtime: float
+    rows: int
+    columns: list[str] = field(default_factory=list)
+
+    @classmethod
+    def from_file(cls, name: str, path: Path, df: pd.DataFrame) -> "DatasetEntry":
+        stat = path.stat()
+        return cls(
+            name=name,
+            path=str(path),
+            size=stat.st_size,
+            mtime=stat.st_mtime,
+            rows=df.shape[0],
+            columns=[str(c) for c in df.columns],
+        )
+
+
+@dataclass
+class DatasetCatalog:
+    """Versioned list of datasets shared by all workers."""
+
+    entries: list[DatasetEntry] = field(default_factory=list)
+    version: str = ""
+
+    @staticmethod
+    def compute_version(entries: list[DatasetEntry]) -> str:
+        fingerprint = json.dumps(
+            [(e.name, e.size, e.mtime, e.columns) for e in entries], sort_keys=True
+        )
+        return hashlib.sha256(fingerprint.encode()).hexdigest()[:16]
+
+    def describe(self) -> str:
+        """Render the dataset info string used in the system prompt."""
+        if not self.entries:
+            return "No datasets available."
+        return "\n".join(
+            f"- **{e.name}** ({e.rows} rows, {len(e.columns)} columns)\n"
+            f"  Columns: {', '.join(e.columns)}"
+            for e in self.entries
+        )
+
+    @classmethod
+    def read(cls, catalog_path: Path) -> "DatasetCatalog":
+        """Read a catalog file, returning an empty catalog if missing."""
+        if not catalog_path.exists():
+            return cls()
+        data = json.loads(catalog_path.read_text())
+        return cls(
+            entries=[DatasetEntry(**e) for e in data.get("entries", [])],
+            version=data.get("version", ""),
+        )
+
+    @classmethod
+    def scan(cls, data_dir: Path) -> "DatasetCatalog":
+        """Catalog of the CSV files currently in data_dir.
+
+        Only headers are read, so row counts are 0; use it to compare versions.
+        """
+        entries = [
+            DatasetEntry.from_file(dataset_name(path), path, pd.read_csv(path, nrows=0))
+            for path in sorted(data_dir.glob("*.csv"))
+        ]
+        return cls(entries=entries, version=cls.compute_version(entries))
+
+    @classmethod
+    def publish(cls, catalog_path: Path, entries: list[DatasetEntry]) -> "DatasetCatalog":
+        """Write the catalog for these entries unless it is already current."""
+        catalog = cls(entries=entries, version=cls.compute_version(entries))
+        catalog_path.parent.mkdir(parents=True, exist_ok=True)
+
+        with _locked(catalog_path):
+            published = cls.read(catalog_path)
+            if published.version == catalog.version:
+                return catalog
+            if published.version:
+                logger.warning(
+                    f"Replacing published dataset catalog {published.version} with "
+                    f"{catalog.version}"
+                )
+
+            tmp_path = catalog_path.with_suffix(".tmp")
+            tmp_path.write_text(
+                json.dumps(
+                    {"version": catalog.version, "entries": [asdict(e) for e in entries]},
+                    indent=2,
+                )
+            )
+            os.replace(tmp_path, catalog_path)
+
+        return catalog
+
+
+@contextmanager
+def _locked(path: Path) -> Iterator[None]:
+    """Hold an exclusive inter-process lock next to `path`."""
+    with open(path.with_suffix(".lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
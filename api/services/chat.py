@@ -1,21 +1,29 @@
 """Chat streaming service."""
 
+import asyncio
 import json
 import logging
+import os
 import re
-from typing import Any, AsyncGenerator
+from typing import Any, AsyncGenerator, Optional
 from urllib.parse import quote
 
+import pandas as pd
 from pydantic_ai.messages import (
     TextPartDelta,
     ThinkingPartDelta,
     ToolReturnPart,
 )
 
-from api.services.session import Session
+from agent.tools.query_guard import run_guarded
+from api.services.answer_cache import CachedAnswer, answer_cache
+from api.services.session import Session, session_manager
 
 logger = logging.getLogger(__name__)
 
+# Re-run approximate queries exactly and stream the result as a follow-up
+APPROX_REFINE = os.getenv("APPROX_REFINE", "true").lower() in ("1", "true", "yes")
+
 _OPEN = "<thinking>"
 _CLOSE = "</thinking>"
 
@@ -83,6 +91,66 @@ def format_sse(event: str, data: dict[str, Any]) -> str:
     return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
 
 
+def data_table_payload(df: pd.DataFrame, **extra: Any) -> dict[str, Any]:
+    """Build a data_table event payload showing the first 100 rows."""
+    display_df = df.head(100)
+    return {
+        "columns": display_df.columns.tolist(),
+        "rows": display_df.values.tolist(),
+        "total_rows": len(df),
+        "displayed_rows": len(display_df),
+        **extra,
+    }
+
+
+def margins_payload(margins: Optional[pd.DataFrame]) -> dict[str, list[Optional[float]]]:
+    """Margins of the displayed rows per column, None where unknown."""
+    if margins is None:
+        return {}
+    shown = margins.head(100)
+    return {
+        str(column): [None if pd.isna(v) else float(v) for v in shown[column]]
+        for column in shown.columns
+        if shown[column].notna().any()
+    }
+
+
+async def refine_query(
+    session: Session,
+    call_id: str,
+    sql: str,
+    approximate_df: Optional[pd.DataFrame],
+) -> Optional[dict[str, Any]]:
+    """Run an approximate query exactly and return its data_table payload."""
+    df, check = await asyncio.to_thread(run_guarded, session.context.sql_tables(), sql)
+    if df is None:
+        logger.warning(f"[{session.id}] Exact rerun rejected: {check.error}")
+        return None
+
+    # Later tools should see the exact data unless a newer query replaced it
+    if session.context.results.get(call_id) is approximate_df:
+        session.context.results[call_id] = df
+    if session.context.current_dataframe is approximate_df:
+        session.context.current_dataframe = df
+    return data_table_payload(df, call_id=call_id, approximate=False, refined=True)
+
+
+def drain_refinements(
+    session: Session, tasks: list[asyncio.Task]
+) -> list[dict[str, Any]]:
+    """Collect payloads of finished refinement tasks, removing them from the list."""
+    payloads: list[dict[str, Any]] = []
+    for task in [t for t in tasks if t.done()]:
+        tasks.remove(task)
+        if task.cancelled():
+            continue
+        if task.exception() is not None:
+            logger.warning(f"[{session.id}] Exact rerun failed: {task.exception()}")
+        elif task.result() is not None:
+            payloads.append(task.result())
+    return payloads
+
+
 async def stream_agent_response(
     session: Session,
     question: str,
@@ -97,13 +165,16 @@ async def stream_agent_response(
     - text_delta: Response text delta
     - tool_call: Tool invocation
     - tool_result: Tool execution result
-    - data_table: Query results table
+    - data_table: Query results table (approximate results carry 95% margins
+      per column and are followed by an exact data_table for the same
+      call_id once it completes)
     - visualization: Generated chart/file URL
     - done: Stream completion
     - error: Error occurred
     """
     session_id = session.id
     logger.info(f"[{session_id}] Starting agent for: {question[:100]}...")
+    refinements: list[asyncio.Task] = []
 
     try:
         yield ": connected\n\n"
@@ -117,6 +188,9 @@ async def stream_agent_response(
         ):
             kind = event.event_kind
 
+            for payload in drain_refinements(session, refinements):
+                yield format_sse("data_table", payload)
+
             # Part start — carries the first chunk of text content
             if kind == "part_start":
                 part = event.part
@@ -177,16 +251,27 @@ async def stream_agent_response(
                     "success": not content.lower().startswith("error"),
                 })
 
-                # Emit data_table event for query_data results
-                if tool_name == "query_data" and session.context.current_dataframe is not None:
-                    df = session.context.current_dataframe
-                    display_df = df.head(100)
-                    yield format_sse("data_table", {
-                        "columns": display_df.columns.tolist(),
-                        "rows": display_df.values.tolist(),
-                        "total_rows": len(df),
-                        "displayed_rows": len(display_df),
-                    })
+                # Emit data_table event for query_data results. Results are
+                # looked up by call id: parallel calls may finish in any order
+                df = session.context.results.get(result.tool_call_id)
+                if tool_name == "query_data" and df is not None:
+                    sql = session.context.refinements.pop(result.tool_call_id, None)
+                    if sql is None:
+                        yield format_sse("data_table", data_table_payload(
+                            df, call_id=result.tool_call_id
+                        ))
+                    else:
+                        margins = session.context.margins.pop(result.tool_call_id, None)
+                        yield format_sse("data_table", data_table_payload(
+                            df,
+                            call_id=result.tool_call_id,
+                            approximate=True,
+                            margins=margins_payload(margins),
+                        ))
+                        if APPROX_REFINE:
+                            refinements.append(asyncio.create_task(
+                                refine_query(session, result.tool_call_id, sql, df)
+                            ))
 
                 # Emit visualization events for generated files
                 if "saved to" in content.lower():
@@ -205,14 +290,22 @@ async def stream_agent_response(
                                 "url": f"/api/files/{encoded}",
                             })
 
-            # Final result — update session history
+            # Final result — update and persist session history
             elif kind == "agent_run_result":
                 session.message_history = list(event.result.all_messages())
+                await asyncio.to_thread(session_manager.save_session, session)
 
         # Flush any remaining buffered content from the tag parser
         for event_type, content in tag_parser.flush():
             yield format_sse(event_type, {"content": content})
 
+        # Wait for exact reruns still in flight, then persist the exact data
+        if refinements:
+            await asyncio.wait(refinements)
+            for payload in drain_refinements(session, refinements):
+                yield format_sse("data_table", payload)
+            await asyncio.to_thread(session_manager.save_session, session)
+
         logger.info(f"[{session_id}] Sending done event...")
         yield format_sse("done", {
             "session_id": session_id,
@@ -222,3 +315,80 @@ async def stream_agent_response(
     except Exception as e:
         logger.exception(f"[{session_id}] Error: {e}")
         yield format_sse("error", {"message": str(e), "code": "AGENT_ERROR"})
+
+    finally:
+        for task in refinements:
+            task.cancel()
+        session.context.refinements.clear()
+        session.context.margins.clear()
+
+
+async def replay_answer(session: Session, entry: CachedAnswer) -> AsyncGenerator[str, None]:
+    """Stream a cached first-turn answer and give the session its resulting state."""
+    session.message_history = list(entry.message_history)
+    session.context.current_dataframe = entry.current_dataframe
+    session.context.tables = dict(entry.tables)
+    session.context.results = dict(entry.results)
+    await asyncio.to_thread(session_manager.save_session, session)
+
+    yield ": connected\n\n"
+    for event in entry.events:
+        yield event
+    yield format_sse("done", {
+        "session_id": session.id,
+        "message_count": len(session.message_history),
+        "cached": True,
+    })
+
+
+async def stream_answer(
+    session: Session,
+    question: str,
+    use_cache: bool = True,
+) -> AsyncGenerator[str, None]:
+    """
+    Stream the answer to a question, using the answer cache for first turns.
+
+    A cached answer is replayed when one exists and use_cache is set.
+    Otherwise the agent runs and, if it finishes without errors, its events
+    are cached (replacing any entry when use_cache is off).
+    """
+    if answer_cache is None or session.message_history:
+        async for chunk in stream_agent_response(session, question):
+            yield chunk
+        return
+
+    key = answer_cache.key(question, session_manager.catalog_version)
+    entry = answer_cache.get(key) if use_cache else None
+    if entry is not None and await asyncio.to_thread(answer_cache.restore_artifacts, entry):
+        logger.info(f"[{session.id}] Replaying cached answer for: {question[:100]}")
+        async for chunk in replay_answer(session, entry):
+            yield chunk
+        return
+    if entry is not None:
+        answer_cache.invalidate(key)
+
+    events: list[str] = []
+    failed = False
+    async for chunk in stream_agent_response(session, question):
+        if chunk.startswith("event: error"):
+            failed = True
+        elif chunk.startswith("event: done"):
+            # Store before the final event; clients may disconnect after it
+            if not failed:
+                try:
+                    await asyncio.to_thread(
+                        answer_cache.put,
+                        key,
+                        events,
+                        session.message_history,
+                        session.context.current_dataframe,
+                        session.context.tables,
+                        session.context.results,
+                    )
+                except Exception:
+                    # The answer was streamed fine; only caching it failed
+                    logger.exception(f"[{session.id}] Failed to cache answer")
+        elif chunk.startswith("event: "):
+            events.append(chunk)
+        yield chunk
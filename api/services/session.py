@@ -1,6 +1,7 @@
 """Session management for multi-turn conversations."""
 
-import re
+import logging
+import os
 import uuid
 from dataclasses import dataclass, field
 from pathlib import Path
@@ -10,7 +11,13 @@ import pandas as pd
 from pydantic_ai import Agent
 
 from agent.agent import create_agent
-from agent.context import AgentContext
+from agent.context import AgentContext, DatasetSample
+from agent.ingest import MemoryReport, dataset_name, read_dataset
+from agent.tools.approximate import build_samples
+from api.services.catalog import DatasetCatalog, DatasetEntry
+from api.services.session_store import SessionStore, StoredSession, create_session_store
+
+logger = logging.getLogger(__name__)
 
 
 @dataclass
@@ -21,16 +28,34 @@ class Session:
     context: AgentContext
     agent: Agent[AgentContext]
     message_history: list[Any] = field(default_factory=list)
+    revision: int = 0
 
 
 class SessionManager:
-    """Manages chat sessions in memory."""
-
-    def __init__(self, data_dir: str = "data"):
+    """Manages chat sessions.
+
+    Live sessions (agent + context) are cached per process; their state is
+    persisted in a SessionStore so other workers can pick them up.
+    """
+
+    def __init__(
+        self,
+        data_dir: str = "data",
+        state_dir: Optional[str] = None,
+        store: Optional[SessionStore] = None,
+    ):
         self._sessions: dict[str, Session] = {}
         self._datasets: dict[str, pd.DataFrame] = {}
+        self._samples: dict[str, DatasetSample] = {}
         self._dataset_info: str = ""
+        self._memory_reports: list[MemoryReport] = []
+        self._catalog = DatasetCatalog()
+        # Published catalog version last warned about, to warn once
+        self._catalog_warned = ""
         self._data_dir = data_dir
+        self._state_dir = Path(state_dir or os.getenv("STATE_DIR", ".state"))
+        self._catalog_path = self._state_dir / "catalog.json"
+        self._store = store or create_session_store()
         self._load_datasets()
 
     def _load_datasets(self) -> None:
@@ -41,61 +66,136 @@ class SessionManager:
             self._dataset_info = "No datasets available."
             return
 
-        info_lines: list[str] = []
+        datasets: dict[str, pd.DataFrame] = {}
+        reports: list[MemoryReport] = []
+        entries: list[DatasetEntry] = []
 
         for csv_file in sorted(data_path.glob("*.csv")):
-            name = re.sub(r"[^a-zA-Z0-9_]", "_", csv_file.stem).strip("_").lower()
-            df = pd.read_csv(csv_file)
-            self._datasets[name] = df
-
-            cols = ", ".join(df.columns.tolist())
-            info_lines.append(
-                f"- **{name}** ({df.shape[0]} rows, {df.shape[1]} columns)\n"
-                f"  Columns: {cols}"
+            name = dataset_name(csv_file)
+            df, report = read_dataset(csv_file, name)
+            datasets[name] = df
+            reports.append(report)
+            entries.append(DatasetEntry.from_file(name, csv_file, df))
+
+        # Publish to the shared catalog so all workers agree on the version
+        self._catalog = DatasetCatalog.publish(self._catalog_path, entries)
+        self._datasets = datasets
+        self._memory_reports = reports
+        self._dataset_info = self._catalog.describe()
+        self._samples = build_samples(datasets)
+
+    def sync_catalog(self) -> bool:
+        """Compare this worker's datasets with the published catalog.
+
+        Reloads the datasets if the files on disk changed to match the
+        published version (another worker loaded newer files), and warns if
+        this worker sees different files than the published ones. Returns
+        True if the datasets were reloaded.
+        """
+        published = DatasetCatalog.read(self._catalog_path)
+        if not published.version or published.version == self._catalog.version:
+            return False
+
+        if DatasetCatalog.scan(Path(self._data_dir)).version == published.version:
+            logger.info(
+                f"Dataset catalog changed from {self._catalog.version} to "
+                f"{published.version}, reloading datasets"
             )
+            self._load_datasets()
+            # Rebuild live sessions from the store with the new datasets
+            self._sessions.clear()
+            return True
 
-        if not info_lines:
-            self._dataset_info = "No datasets available."
-        else:
-            self._dataset_info = "\n".join(info_lines)
-
-    def create_session(self, session_id: Optional[str] = None) -> Session:
-        """Create a new chat session."""
-        sid = session_id or str(uuid.uuid4())
-
-        if sid in self._sessions:
-            return self._sessions[sid]
+        if self._catalog_warned != published.version:
+            self._catalog_warned = published.version
+            logger.warning(
+                f"This worker serves dataset catalog {self._catalog.version}, but "
+                f"{published.version} is published and doesn't match the files in "
+                f"{self._data_dir}. Workers must share the same data directory."
+            )
+        return False
 
+    def _build_session(self, session_id: str) -> Session:
+        """Build a live session with a fresh agent and context."""
         context = AgentContext(
             datasets=self._datasets.copy(),
             dataset_info=self._dataset_info,
+            samples=self._samples,
         )
         agent = create_agent(self._dataset_info)
+        return Session(id=session_id, context=context, agent=agent)
 
-        session = Session(
-            id=sid,
-            context=context,
-            agent=agent,
-        )
+    def _apply(self, session: Session, stored: StoredSession) -> None:
+        """Refresh a live session from its persisted state."""
+        session.message_history = list(stored.message_history)
+        session.context.current_dataframe = stored.current_dataframe
+        session.context.tables = dict(stored.tables)
+        # Per-call results aren't persisted; the old ones belong to another state
+        session.context.results = {}
+        session.revision = stored.revision
+
+    def create_session(self, session_id: Optional[str] = None) -> Session:
+        """Create a new chat session."""
+        sid = session_id or str(uuid.uuid4())
+
+        existing = self.get_session(sid)
+        if existing is not None:
+            return existing
+
+        session = self._build_session(sid)
         self._sessions[sid] = session
+        self.save_session(session)
         return session
 
     def get_session(self, session_id: str) -> Optional[Session]:
-        """Get an existing session by ID."""
-        return self._sessions.get(session_id)
+        """Get an existing session by ID, syncing it from the store if stale."""
+        revision = self._store.revision(session_id)
+        session = self._sessions.get(session_id)
+
+        if revision is None:
+            # Never persisted, or deleted by another worker
+            self._sessions.pop(session_id, None)
+            return None
+
+        if session is not None and session.revision == revision:
+            return session
+
+        stored = self._store.load(session_id)
+        if stored is None:
+            self._sessions.pop(session_id, None)
+            return None
+
+        if session is None:
+            session = self._build_session(session_id)
+            self._sessions[session_id] = session
+        self._apply(session, stored)
+        return session
 
     def get_or_create_session(self, session_id: Optional[str] = None) -> Session:
         """Get existing session or create new one."""
-        if session_id and session_id in self._sessions:
-            return self._sessions[session_id]
+        if session_id:
+            session = self.get_session(session_id)
+            if session is not None:
+                return session
         return self.create_session(session_id)
 
+    def save_session(self, session: Session) -> None:
+        """Persist a session's history and last result to the store."""
+        session.revision = self._store.save(
+            session.id,
+            session.message_history,
+            session.context.current_dataframe,
+            session.context.tables,
+        )
+
+    def flush_sessions(self) -> int:
+        """Write pending session snapshots. Returns the number written."""
+        return self._store.flush()
+
     def delete_session(self, session_id: str) -> bool:
         """Delete a session."""
-        if session_id in self._sessions:
-            del self._sessions[session_id]
-            return True
-        return False
+        self._sessions.pop(session_id, None)
+        return self._store.delete(session_id)
 
     @property
     def datasets(self) -> dict[str, pd.DataFrame]:
@@ -107,6 +207,16 @@ class SessionManager:
         """Get dataset info string."""
         return self._dataset_info
 
+    @property
+    def memory_reports(self) -> list[MemoryReport]:
+        """Get per-dataset memory usage before and after dtype optimization."""
+        return self._memory_reports
+
+    @property
+    def catalog_version(self) -> str:
+        """Get the version of the shared dataset catalog."""
+        return self._catalog.version
+
 
 # Global session manager instance
 session_manager = SessionManager()
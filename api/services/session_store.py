@@ -0,0 +1,468 @@
+"""
+Pluggable storage backends for session state.
+
+The memory backend keeps everything in the current process (single worker).
+The SQLite backend stores message history in a SQLite database and the last
+query result as a Parquet file, both under a shared state directory, so every
+uvicorn worker sees the same sessions. The snapshot backend serves sessions
+from memory and periodically snapshots them to the same SQLite layout, so
+they survive restarts without paying for a disk write on every turn.
+
+Select the backend with environment variables:
+    SESSION_BACKEND=memory|sqlite|snapshot   (default: memory)
+    STATE_DIR=.state                         (directory for sqlite/snapshot)
+    SNAPSHOT_INTERVAL=30                     (seconds between snapshots)
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import weakref
+import zlib
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+
+import duckdb
+import pandas as pd
+from pydantic_ai.messages import ModelMessagesTypeAdapter
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StoredSession:
+    """Persisted state of a session, independent of any worker process."""
+
+    id: str
+    revision: int
+    message_history: list[Any]
+    current_dataframe: Optional[pd.DataFrame] = None
+    tables: dict[str, pd.DataFrame] = field(default_factory=dict)
+
+
+class SessionStore(ABC):
+    """Interface for session state backends.
+
+    Every save bumps the session revision so workers can cheaply detect that
+    their local copy is stale.
+    """
+
+    @abstractmethod
+    def revision(self, session_id: str) -> Optional[int]:
+        """Return the current revision of a session, or None if unknown."""
+
+    @abstractmethod
+    def load(self, session_id: str) -> Optional[StoredSession]:
+        """Load a session, or None if unknown."""
+
+    @abstractmethod
+    def save(
+        self,
+        session_id: str,
+        message_history: list[Any],
+        current_dataframe: Optional[pd.DataFrame],
+        tables: Optional[dict[str, pd.DataFrame]] = None,
+    ) -> int:
+        """Persist a session (history, last result, session tables) and return its new revision."""
+
+    @abstractmethod
+    def delete(self, session_id: str) -> bool:
+        """Delete a session. Returns True if it existed."""
+
+    def flush(self) -> int:
+        """Write pending state to durable storage. Returns sessions written."""
+        return 0
+
+
+class MemorySessionStore(SessionStore):
+    """Process-local store. Sessions are not shared between workers."""
+
+    def __init__(self) -> None:
+        self._sessions: dict[str, StoredSession] = {}
+
+    def revision(self, session_id: str) -> Optional[int]:
+        stored = self._sessions.get(session_id)
+        return stored.revision if stored else None
+
+    def load(self, session_id: str) -> Optional[StoredSession]:
+        return self._sessions.get(session_id)
+
+    def save(
+        self,
+        session_id: str,
+        message_history: list[Any],
+        current_dataframe: Optional[pd.DataFrame],
+        tables: Optional[dict[str, pd.DataFrame]] = None,
+    ) -> int:
+        revision = (self.revision(session_id) or 0) + 1
+        self._sessions[session_id] = StoredSession(
+            id=session_id,
+            revision=revision,
+            message_history=message_history,
+            current_dataframe=current_dataframe,
+            tables=dict(tables or {}),
+        )
+        return revision
+
+    def delete(self, session_id: str) -> bool:
+        return self._sessions.pop(session_id, None) is not None
+
+
+class SQLiteSessionStore(SessionStore):
+    """Shared store backed by SQLite plus Parquet result files.
+
+    Message history is appended per turn: each save stores only the messages
+    added since the previous save, as one zlib-compressed JSON chunk. The last
+    result and session tables are only rewritten when their DataFrame changed.
+
+    Safe to use from several processes: SQLite serialises writers and runs in
+    WAL mode so readers never block on them.
+    """
+
+    def __init__(self, state_dir: str = ".state") -> None:
+        self._state_dir = Path(state_dir)
+        self._results_dir = self._state_dir / "results"
+        self._results_dir.mkdir(parents=True, exist_ok=True)
+        self._db_path = self._state_dir / "sessions.db"
+        # Last DataFrame written per (session, table) by this process, to skip
+        # rewrites. The empty table name is the current result.
+        self._written: dict[tuple[str, str], weakref.ref] = {}
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sessions (
+                    id TEXT PRIMARY KEY,
+                    revision INTEGER NOT NULL,
+                    message_count INTEGER NOT NULL,
+                    result_path TEXT,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS session_messages (
+                    session_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    payload BLOB NOT NULL,
+                    PRIMARY KEY (session_id, seq)
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS session_tables (
+                    session_id TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    PRIMARY KEY (session_id, name)
+                )
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self._db_path, timeout=30)
+
+    def _result_path(self, session_id: str, revision: int, table: str = "") -> Path:
+        # Session IDs come from clients, so hash them for a safe filename.
+        # Table names are validated SQL identifiers.
+        digest = hashlib.sha256(session_id.encode()).hexdigest()[:32]
+        suffix = f"-t_{table}" if table else ""
+        return self._results_dir / f"{digest}{suffix}-{revision}.parquet"
+
+    def revision(self, session_id: str) -> Optional[int]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT revision FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def load(self, session_id: str) -> Optional[StoredSession]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT revision, result_path FROM sessions WHERE id = ?",
+                (session_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            chunks = conn.execute(
+                "SELECT payload FROM session_messages WHERE session_id = ? ORDER BY seq",
+                (session_id,),
+            ).fetchall()
+            table_rows = conn.execute(
+                "SELECT name, path FROM session_tables WHERE session_id = ? ORDER BY rowid",
+                (session_id,),
+            ).fetchall()
+
+        revision, result_path = row
+        message_history: list[Any] = []
+        for (payload,) in chunks:
+            message_history.extend(ModelMessagesTypeAdapter.validate_json(zlib.decompress(payload)))
+
+        current_dataframe = None
+        if result_path and Path(result_path).exists():
+            current_dataframe = _read_parquet(Path(result_path))
+            self._written[(session_id, "")] = weakref.ref(current_dataframe)
+
+        tables: dict[str, pd.DataFrame] = {}
+        for name, path in table_rows:
+            if Path(path).exists():
+                tables[name] = _read_parquet(Path(path))
+                self._written[(session_id, name)] = weakref.ref(tables[name])
+
+        return StoredSession(
+            id=session_id,
+            revision=revision,
+            message_history=message_history,
+            current_dataframe=current_dataframe,
+            tables=tables,
+        )
+
+    def save(
+        self,
+        session_id: str,
+        message_history: list[Any],
+        current_dataframe: Optional[pd.DataFrame],
+        tables: Optional[dict[str, pd.DataFrame]] = None,
+    ) -> int:
+        with self._connect() as conn:
+            # Take the write lock up front so concurrent workers can't race on revision
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT revision, message_count, result_path FROM sessions WHERE id = ?",
+                (session_id,),
+            ).fetchone()
+            revision = (row[0] if row else 0) + 1
+            stored_count = row[1] if row else 0
+            old_result_path = row[2] if row else None
+
+            # History only grows between turns; anything else is a rewrite
+            if len(message_history) < stored_count:
+                conn.execute("DELETE FROM session_messages WHERE session_id = ?", (session_id,))
+                stored_count = 0
+
+            new_messages = message_history[stored_count:]
+            if new_messages:
+                payload = zlib.compress(ModelMessagesTypeAdapter.dump_json(new_messages))
+                conn.execute(
+                    """
+                    INSERT INTO session_messages (session_id, seq, payload)
+                    VALUES (?, (SELECT COALESCE(MAX(seq), -1) + 1
+                                FROM session_messages WHERE session_id = ?), ?)
+                    """,
+                    (session_id, session_id, payload),
+                )
+
+            result_path = self._save_frame(
+                session_id, "", revision, current_dataframe, old_result_path
+            )
+            stale_paths = self._save_tables(conn, session_id, revision, tables or {})
+
+            conn.execute(
+                """
+                INSERT INTO sessions (id, revision, message_count, result_path, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    revision = excluded.revision,
+                    message_count = excluded.message_count,
+                    result_path = excluded.result_path,
+                    updated_at = excluded.updated_at
+                """,
+                (session_id, revision, len(message_history), result_path, time.time()),
+            )
+
+        if old_result_path and old_result_path != result_path:
+            stale_paths.append(old_result_path)
+        for path in stale_paths:
+            Path(path).unlink(missing_ok=True)
+        return revision
+
+    def _save_tables(
+        self,
+        conn: sqlite3.Connection,
+        session_id: str,
+        revision: int,
+        tables: dict[str, pd.DataFrame],
+    ) -> list[str]:
+        """Write changed session tables and return paths that are now unused."""
+        old_paths = dict(
+            conn.execute(
+                "SELECT name, path FROM session_tables WHERE session_id = ?", (session_id,)
+            ).fetchall()
+        )
+        # Reinsert every row so rowid order keeps the tables' recency order
+        conn.execute("DELETE FROM session_tables WHERE session_id = ?", (session_id,))
+
+        kept: set[str] = set()
+        for name, df in tables.items():
+            path = self._save_frame(session_id, name, revision, df, old_paths.get(name))
+            if path is None:
+                continue
+            kept.add(path)
+            conn.execute(
+                "INSERT INTO session_tables (session_id, name, path) VALUES (?, ?, ?)",
+                (session_id, name, path),
+            )
+
+        for name in set(old_paths) - set(tables):
+            self._written.pop((session_id, name), None)
+        return [path for path in old_paths.values() if path not in kept]
+
+    def _save_frame(
+        self,
+        session_id: str,
+        table: str,
+        revision: int,
+        df: Optional[pd.DataFrame],
+        old_path: Optional[str],
+    ) -> Optional[str]:
+        """Write a result or session table if it changed and return its path."""
+        key = (session_id, table)
+        if df is None:
+            self._written.pop(key, None)
+            return None
+
+        written = self._written.get(key)
+        if written is not None and written() is df and old_path:
+            return old_path
+
+        path = self._result_path(session_id, revision, table)
+        try:
+            _write_parquet(df, path)
+        except Exception as e:
+            logger.warning(f"[{session_id}] Could not persist {table or 'query result'}: {e}")
+            return None
+
+        self._written[key] = weakref.ref(df)
+        return str(path)
+
+    def delete(self, session_id: str) -> bool:
+        for key in [k for k in self._written if k[0] == session_id]:
+            del self._written[key]
+
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT result_path FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                return False
+            paths = [
+                path
+                for (path,) in conn.execute(
+                    "SELECT path FROM session_tables WHERE session_id = ?", (session_id,)
+                ).fetchall()
+            ]
+            conn.execute("DELETE FROM session_tables WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM session_messages WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+        if row[0]:
+            paths.append(row[0])
+        for path in paths:
+            Path(path).unlink(missing_ok=True)
+        return True
+
+
+class SnapshotSessionStore(MemorySessionStore):
+    """In-memory store with periodic write-behind snapshots to SQLite.
+
+    Saves only mark the session dirty; flush() writes dirty sessions to disk.
+    Sessions missing from memory (e.g. after a restart) are restored lazily
+    from the last snapshot on first access. Single worker only.
+    """
+
+    def __init__(self, state_dir: str = ".state") -> None:
+        super().__init__()
+        self._disk = SQLiteSessionStore(state_dir)
+        self._dirty: set[str] = set()
+        self._lock = threading.Lock()
+
+    def revision(self, session_id: str) -> Optional[int]:
+        revision = super().revision(session_id)
+        if revision is None:
+            revision = self._disk.revision(session_id)
+        return revision
+
+    def load(self, session_id: str) -> Optional[StoredSession]:
+        stored = super().load(session_id)
+        if stored is None:
+            stored = self._disk.load(session_id)
+            if stored is not None:
+                self._sessions[session_id] = stored
+        return stored
+
+    def save(
+        self,
+        session_id: str,
+        message_history: list[Any],
+        current_dataframe: Optional[pd.DataFrame],
+        tables: Optional[dict[str, pd.DataFrame]] = None,
+    ) -> int:
+        revision = super().save(session_id, message_history, current_dataframe, tables)
+        with self._lock:
+            self._dirty.add(session_id)
+        return revision
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            self._dirty.discard(session_id)
+        in_memory = super().delete(session_id)
+        on_disk = self._disk.delete(session_id)
+        return in_memory or on_disk
+
+    def flush(self) -> int:
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+
+        flushed = 0
+        for session_id in dirty:
+            stored = self._sessions.get(session_id)
+            if stored is None:
+                continue
+            try:
+                self._disk.save(
+                    session_id, stored.message_history, stored.current_dataframe, stored.tables
+                )
+                flushed += 1
+            except Exception as e:
+                logger.warning(f"[{session_id}] Snapshot failed: {e}")
+                with self._lock:
+                    self._dirty.add(session_id)
+        return flushed
+
+
+def _write_parquet(df: pd.DataFrame, path: Path) -> None:
+    """Write a DataFrame to Parquet through DuckDB."""
+    tmp_path = path.with_suffix(".tmp")
+    escaped = str(tmp_path).replace("'", "''")
+    with duckdb.connect(database=":memory:") as conn:
+        conn.register("result_df", df)
+        conn.execute(f"COPY result_df TO '{escaped}' (FORMAT PARQUET, COMPRESSION ZSTD)")
+    os.replace(tmp_path, path)
+
+
+def _read_parquet(path: Path) -> pd.DataFrame:
+    """Read a Parquet file written by _write_parquet."""
+    with duckdb.connect(database=":memory:") as conn:
+        return conn.execute("SELECT * FROM read_parquet(?)", [str(path)]).fetchdf()
+
+
+def create_session_store() -> SessionStore:
+    """Create the session store configured by SESSION_BACKEND."""
+    backend = os.getenv("SESSION_BACKEND", "memory").lower()
+    if backend == "memory":
+        return MemorySessionStore()
+    if backend == "sqlite":
+        return SQLiteSessionStore(os.getenv("STATE_DIR", ".state"))
+    if backend == "snapshot":
+        return SnapshotSessionStore(os.getenv("STATE_DIR", ".state"))
+    raise ValueError(
+        f"Unknown SESSION_BACKEND '{backend}'. Use 'memory', 'sqlite' or 'snapshot'."
+    )
@@ -0,0 +1,100 @@
+"""
+Check that compact dataset dtypes don't change query results.
+
+Loads every CSV in data/ twice, with pandas' default dtypes and with
+agent.ingest's compact dtypes, runs the same queries on both the way
+query_data does (register_table + the query guard) and reports any
+difference. Queries cover every column with grouping, extremes, ordering
+and nested aggregates (LIST, MAP, STRUCT results), where categorical
+columns are most likely to leak. Exits with status 1 on any difference.
+
+Usage:
+    python -m benchmarks.check_ingest
+"""
+
+import sys
+from pathlib import Path
+from typing import Any
+
+import duckdb
+import pandas as pd
+
+from agent.ingest import dataset_name, optimize_dtypes, register_table
+from agent.tools.query_guard import run_checked
+
+
+def _queries(name: str, df: pd.DataFrame) -> list[str]:
+    queries = []
+    first = f'"{df.columns[0]}"'
+    for column in df.columns:
+        c = f'"{column}"'
+        queries += [
+            f"SELECT {c}, COUNT(*) AS n FROM {name} GROUP BY 1 ORDER BY 1 NULLS LAST",
+            f"SELECT * FROM {name} WHERE {c} IS NOT NULL ORDER BY {c}, {first} LIMIT 20",
+            f"SELECT MIN({c}) AS mn, MAX({c}) AS mx, COUNT(DISTINCT {c}) AS nd FROM {name}",
+            f"SELECT list(DISTINCT {c} ORDER BY {c}) AS l FROM {name}",
+            f"SELECT array_agg({c} ORDER BY {c}, {first}) AS l FROM (SELECT * FROM {name} LIMIT 50)",
+            f"SELECT histogram({c}) AS h FROM (SELECT * FROM {name} ORDER BY {first} LIMIT 50)",
+            f"SELECT struct_pack(v := {c}) AS s FROM {name} ORDER BY {first} LIMIT 5",
+            f"SELECT string_agg(DISTINCT CAST({c} AS VARCHAR), ',' ORDER BY CAST({c} AS VARCHAR)) AS s "
+            f"FROM {name}",
+        ]
+    return queries
+
+
+def _cell(value: Any) -> str:
+    """Comparable text for a cell, including nested arrays and dicts."""
+    if hasattr(value, "tolist"):
+        value = value.tolist()
+    return repr(value)
+
+
+def _difference(raw: pd.DataFrame, compact: pd.DataFrame) -> str:
+    if list(raw.columns) != list(compact.columns):
+        return f"columns {list(raw.columns)} != {list(compact.columns)}"
+    if list(raw.dtypes.astype(str)) != list(compact.dtypes.astype(str)):
+        return f"dtypes {list(raw.dtypes.astype(str))} != {list(compact.dtypes.astype(str))}"
+    left = raw.map(_cell).values.tolist()
+    right = compact.map(_cell).values.tolist()
+    for row, (a, b) in enumerate(zip(left, right)):
+        if a != b:
+            return f"row {row}: {a} != {b}"
+    if len(left) != len(right):
+        return f"{len(left)} rows != {len(right)} rows"
+    return ""
+
+
+def main(data_dir: str = "data") -> int:
+    raw: dict[str, pd.DataFrame] = {}
+    compact: dict[str, pd.DataFrame] = {}
+    for path in sorted(Path(data_dir).glob("*.csv")):
+        name = dataset_name(path)
+        raw[name] = pd.read_csv(path)
+        compact[name] = optimize_dtypes(raw[name])
+
+    checked = 0
+    failures = []
+    with duckdb.connect(database=":memory:") as raw_conn, duckdb.connect(
+        database=":memory:"
+    ) as compact_conn:
+        for name in raw:
+            register_table(raw_conn, name, raw[name])
+            register_table(compact_conn, name, compact[name])
+
+        for name, df in raw.items():
+            for sql in _queries(name, df):
+                expected, _ = run_checked(raw_conn, sql, raw)
+                actual, _ = run_checked(compact_conn, sql, compact)
+                checked += 1
+                difference = _difference(expected, actual)
+                if difference:
+                    failures.append(f"{sql}\n    {difference}")
+
+    for failure in failures:
+        print(failure)
+    print(f"{checked} queries, {len(failures)} differences")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,417 @@
+"""
+Offline benchmark for the Data Analysis Agent.
+
+Replays scripted tool-call sequences (see benchmarks/scripted_model.py)
+against the real CSVs in data/, with no network access, and reports
+throughput and p50/p99 latency per stage plus memory growth under N
+concurrent sessions.
+
+Stages:
+    sse_encode        format_sse on representative event payloads
+    thinking_parser   ThinkingTagParser over token-sized deltas
+    query_data        query_data tool against the loaded datasets
+    visualize         visualize tool on the query result
+    cli_run           main.py-style agent.run turns
+    chat_stream       /api/chat/stream responses, one per turn
+    chat_stream_ttfb  time to the first SSE event of each turn
+
+Usage:
+    python -m benchmarks.run
+    python -m benchmarks.run --sessions 16 --turns 3 --latency 0.05
+    python -m benchmarks.run --json bench.json
+    python -m benchmarks.run --baseline bench.json --max-regression 0.25
+
+Generated charts and session state are written to a scratch directory
+(BENCH_WORKDIR, or a temporary directory removed afterwards), never to the
+repository's output/ and .state/.
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Optional
+
+# Agents are created from the MODEL env var; a test model avoids needing
+# provider credentials. Every run overrides it with the scripted model.
+os.environ["MODEL"] = "test"
+
+# Scratch directory for generated files; the session manager reads STATE_DIR
+# when it is imported, so it has to be set first.
+KEEP_WORKDIR = bool(os.getenv("BENCH_WORKDIR"))
+WORKDIR = Path(os.getenv("BENCH_WORKDIR") or tempfile.mkdtemp(prefix="agent-bench-")).resolve()
+os.environ["STATE_DIR"] = str(WORKDIR / "state")
+
+from pydantic_ai.models.function import FunctionModel
+
+from agent.agent import create_agent
+from agent.context import AgentContext
+from agent.tools.query_data import query_data
+from agent.tools.visualize import visualize
+from api.routes.chat import stream_chat
+from api.services.chat import ThinkingTagParser, format_sse
+from api.services.session import session_manager
+from benchmarks.scripted_model import SCENARIOS, build_scripted_model, chunk_text, script_step
+
+
+# ---------------------------------------------------------------------------
+# Statistics
+# ---------------------------------------------------------------------------
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+@dataclass
+class StageStats:
+    """Latency samples (in seconds) and wall time for one benchmark stage."""
+
+    name: str
+    samples: list[float] = field(default_factory=list)
+    wall: float = 0.0
+
+    def summary(self) -> dict[str, float]:
+        values = sorted(self.samples)
+        count = len(values)
+        return {
+            "count": count,
+            "throughput_per_s": count / self.wall if self.wall else 0.0,
+            "mean_ms": (sum(values) / count * 1000) if count else 0.0,
+            "p50_ms": _percentile(values, 50) * 1000,
+            "p99_ms": _percentile(values, 99) * 1000,
+        }
+
+
+class Timer:
+    """Context manager appending the elapsed time to a StageStats."""
+
+    def __init__(self, stats: StageStats) -> None:
+        self.stats = stats
+
+    def __enter__(self) -> "Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stats.samples.append(time.perf_counter() - self.start)
+
+
+def _check(result: str, stage: str) -> None:
+    """Fail loudly if a tool returned an error string."""
+    if result.lower().startswith("error"):
+        raise RuntimeError(f"{stage} failed: {result}")
+
+
+# ---------------------------------------------------------------------------
+# Stages
+# ---------------------------------------------------------------------------
+def bench_sse_encode(iterations: int) -> StageStats:
+    stats = StageStats("sse_encode")
+    table = session_manager.datasets["telcoclient"].head(100)
+    payloads = [
+        ("text_delta", {"content": "The churn rate is highest for"}),
+        ("tool_call", {"name": "query_data", "args": {"sql": SCENARIOS[0].sql}, "call_id": "call_1"}),
+        ("data_table", {
+            "columns": table.columns.tolist(),
+            "rows": table.values.tolist(),
+            "total_rows": len(table),
+            "displayed_rows": len(table),
+        }),
+    ]
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for event, data in payloads:
+            with Timer(stats):
+                format_sse(event, data)
+    stats.wall = time.perf_counter() - start
+    return stats
+
+
+def bench_thinking_parser(iterations: int, chunk_size: int) -> StageStats:
+    stats = StageStats("thinking_parser")
+    texts = [script_step(s.question, step)[0] for s in SCENARIOS for step in range(3)]
+    streams = [chunk_text(text, chunk_size) for text in texts]
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for chunks in streams:
+            with Timer(stats):
+                parser = ThinkingTagParser()
+                for chunk in chunks:
+                    parser.feed(chunk)
+                parser.flush()
+    stats.wall = time.perf_counter() - start
+    return stats
+
+
+async def bench_tools(iterations: int) -> tuple[StageStats, StageStats]:
+    query_stats = StageStats("query_data")
+    visualize_stats = StageStats("visualize")
+    context = AgentContext(
+        datasets=session_manager.datasets.copy(),
+        dataset_info=session_manager.dataset_info,
+    )
+    # The tools only read ctx.deps, so a bare namespace stands in for RunContext.
+    ctx: Any = SimpleNamespace(deps=context)
+
+    for _ in range(iterations):
+        for scenario in SCENARIOS:
+            start = time.perf_counter()
+            result = await query_data(ctx, scenario.sql, scenario.title)
+            query_stats.samples.append(time.perf_counter() - start)
+            _check(result, "query_data")
+
+            start = time.perf_counter()
+            result = await visualize(
+                ctx, scenario.code, scenario.title, scenario.result_type, scenario.title
+            )
+            visualize_stats.samples.append(time.perf_counter() - start)
+            _check(result, "visualize")
+
+    query_stats.wall = sum(query_stats.samples)
+    visualize_stats.wall = sum(visualize_stats.samples)
+    return query_stats, visualize_stats
+
+
+async def bench_cli_run(iterations: int, model: FunctionModel) -> StageStats:
+    stats = StageStats("cli_run")
+    agent = create_agent(session_manager.dataset_info)
+    context = AgentContext(
+        datasets=session_manager.datasets.copy(),
+        dataset_info=session_manager.dataset_info,
+    )
+    message_history: list[Any] = []
+
+    start = time.perf_counter()
+    with agent.override(model=model):
+        for _ in range(iterations):
+            for scenario in SCENARIOS:
+                with Timer(stats):
+                    result = await agent.run(
+                        scenario.question,
+                        deps=context,
+                        message_history=message_history or None,
+                    )
+                message_history = result.all_messages()
+    stats.wall = time.perf_counter() - start
+    return stats
+
+
+async def bench_chat_stream(
+    sessions: int, turns: int, model: FunctionModel
+) -> tuple[StageStats, StageStats, list[str]]:
+    """Run `sessions` concurrent conversations of `turns` questions each."""
+    turn_stats = StageStats("chat_stream")
+    ttfb_stats = StageStats("chat_stream_ttfb")
+    session_ids = [f"bench-{uuid.uuid4()}" for _ in range(sessions)]
+
+    async def converse(index: int, session_id: str) -> None:
+        for turn in range(turns):
+            question = SCENARIOS[(index + turn) % len(SCENARIOS)].question
+            start = time.perf_counter()
+            first_event: Optional[float] = None
+
+            response = await stream_chat(question, session_id)
+            async for chunk in response.body_iterator:
+                text = chunk if isinstance(chunk, str) else chunk.decode()
+                if text.startswith(":"):
+                    continue
+                if first_event is None:
+                    first_event = time.perf_counter() - start
+                if text.startswith("event: error"):
+                    raise RuntimeError(f"chat_stream failed: {text.strip()}")
+
+            turn_stats.samples.append(time.perf_counter() - start)
+            ttfb_stats.samples.append(first_event or 0.0)
+
+    with ExitStack() as stack:
+        for session_id in session_ids:
+            session = session_manager.get_or_create_session(session_id)
+            stack.enter_context(session.agent.override(model=model))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(converse(i, sid) for i, sid in enumerate(session_ids)))
+        turn_stats.wall = ttfb_stats.wall = time.perf_counter() - start
+
+    return turn_stats, ttfb_stats, session_ids
+
+
+async def measure_session_memory(sessions: int, turns: int, model: FunctionModel) -> dict[str, float]:
+    """Measure Python heap growth while holding `sessions` live sessions."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        _, _, session_ids = await bench_chat_stream(sessions, turns, model)
+        gc.collect()
+        live, peak = tracemalloc.get_traced_memory()
+
+        for session_id in session_ids:
+            session_manager.delete_session(session_id)
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    mib = 1024 * 1024
+    return {
+        "sessions": sessions,
+        "growth_mib": (live - baseline) / mib,
+        "per_session_kib": (live - baseline) / sessions / 1024 if sessions else 0.0,
+        "peak_mib": (peak - baseline) / mib,
+        "retained_after_delete_mib": (retained - baseline) / mib,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Reporting
+# ---------------------------------------------------------------------------
+def print_report(stages: list[StageStats], memory: Optional[dict[str, float]]) -> None:
+    print(f"\n{'stage':<18} {'count':>7} {'ops/s':>10} {'mean ms':>10} {'p50 ms':>10} {'p99 ms':>10}")
+    print("-" * 70)
+    for stage in stages:
+        s = stage.summary()
+        print(
+            f"{stage.name:<18} {s['count']:>7} {s['throughput_per_s']:>10.1f} "
+            f"{s['mean_ms']:>10.3f} {s['p50_ms']:>10.3f} {s['p99_ms']:>10.3f}"
+        )
+
+    if memory:
+        print(
+            f"\nMemory ({memory['sessions']} sessions): "
+            f"+{memory['growth_mib']:.2f} MiB live "
+            f"({memory['per_session_kib']:.1f} KiB/session), "
+            f"peak +{memory['peak_mib']:.2f} MiB, "
+            f"retained after delete +{memory['retained_after_delete_mib']:.2f} MiB"
+        )
+
+
+def compare_to_baseline(
+    results: dict[str, Any], baseline_path: Path, max_regression: float
+) -> list[str]:
+    """Return a description of every stage whose p50 regressed past the threshold."""
+    baseline = json.loads(baseline_path.read_text())
+    regressions: list[str] = []
+    for name, current in results["stages"].items():
+        previous = baseline.get("stages", {}).get(name)
+        if not previous or not previous.get("p50_ms"):
+            continue
+        ratio = current["p50_ms"] / previous["p50_ms"]
+        if ratio > 1 + max_regression:
+            regressions.append(
+                f"{name}: p50 {previous['p50_ms']:.3f} ms -> {current['p50_ms']:.3f} ms "
+                f"(+{(ratio - 1) * 100:.0f}%)"
+            )
+    return regressions
+
+
+# ---------------------------------------------------------------------------
+# Entry point
+# ---------------------------------------------------------------------------
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline benchmark for the data analysis agent.")
+    parser.add_argument("--sessions", type=int, default=8, help="Concurrent chat sessions.")
+    parser.add_argument("--turns", type=int, default=3, help="Questions asked per session.")
+    parser.add_argument("--iterations", type=int, default=20, help="Repetitions for micro-benchmarks.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated model latency (s) per response.")
+    parser.add_argument("--chunk-size", type=int, default=4, help="Characters per streamed text delta.")
+    parser.add_argument("--skip-memory", action="store_true", help="Skip the memory growth measurement.")
+    parser.add_argument("--json", type=Path, help="Write results as JSON to this path.")
+    parser.add_argument("--baseline", type=Path, help="Compare p50 latencies to a previous JSON result.")
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=0.25,
+        help="Allowed relative p50 slowdown against --baseline before failing.",
+    )
+    return parser.parse_args(argv)
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    if not session_manager.datasets:
+        raise SystemExit("No CSV files found in data/.")
+
+    model = build_scripted_model(latency=args.latency, chunk_size=args.chunk_size)
+
+    stages: list[StageStats] = [
+        bench_sse_encode(args.iterations * 10),
+        bench_thinking_parser(args.iterations * 10, args.chunk_size),
+    ]
+    stages.extend(await bench_tools(args.iterations))
+    stages.append(await bench_cli_run(max(1, args.iterations // 4), model))
+
+    turn_stats, ttfb_stats, session_ids = await bench_chat_stream(args.sessions, args.turns, model)
+    stages.extend([turn_stats, ttfb_stats])
+    for session_id in session_ids:
+        session_manager.delete_session(session_id)
+
+    memory = None
+    if not args.skip_memory:
+        memory = await measure_session_memory(args.sessions, args.turns, model)
+
+    print_report(stages, memory)
+
+    return {
+        "config": {
+            "sessions": args.sessions,
+            "turns": args.turns,
+            "iterations": args.iterations,
+            "latency": args.latency,
+            "chunk_size": args.chunk_size,
+        },
+        "stages": {stage.name: stage.summary() for stage in stages},
+        "memory": memory,
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    args = parse_args(argv)
+    if args.json:
+        args.json = args.json.resolve()
+    if args.baseline:
+        args.baseline = args.baseline.resolve()
+
+    # Datasets are already loaded; tools write output/ relative to the cwd
+    cwd = os.getcwd()
+    WORKDIR.mkdir(parents=True, exist_ok=True)
+    os.chdir(WORKDIR)
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        os.chdir(cwd)
+        if not KEEP_WORKDIR:
+            shutil.rmtree(WORKDIR, ignore_errors=True)
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+        print(f"\nResults written to {args.json}")
+
+    if args.baseline:
+        regressions = compare_to_baseline(results, args.baseline, args.max_regression)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("\nNo regressions against baseline.")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+"""Scripted PydanticAI model that replays fixed tool-call sequences.
+
+Each scenario is a question plus the SQL and plotting code the agent would
+produce for it. The model answers every turn in three steps, mirroring the
+workflow in the system prompt: think + `query_data`, think + `visualize`,
+then a final insight. No network access is needed.
+"""
+
+import asyncio
+import json
+import uuid
+from dataclasses import dataclass
+from typing import AsyncIterator, Union
+
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelRequest,
+    ModelResponse,
+    TextPart,
+    ToolCallPart,
+    UserPromptPart,
+)
+from pydantic_ai.models.function import AgentInfo, DeltaToolCall, DeltaToolCalls, FunctionModel
+
+
+@dataclass(frozen=True)
+class Scenario:
+    """A scripted question with the tool calls replayed for it."""
+
+    question: str
+    sql: str
+    code: str
+    title: str
+    result_type: str = "figure"
+
+
+SCENARIOS: list[Scenario] = [
+    Scenario(
+        question="What is the churn rate by contract type?",
+        sql=(
+            "SELECT Contract, COUNT(*) AS customers,\n"
+            "       AVG(CASE WHEN Churn = 'Yes' THEN 1.0 ELSE 0.0 END) AS churn_rate\n"
+            "FROM telcoclient\n"
+            "GROUP BY Contract\n"
+            "ORDER BY churn_rate DESC"
+        ),
+        code=(
+            "fig = px.bar(df, x='Contract', y='churn_rate', title='Churn rate by contract')\n"
+            "fig.update_layout(template='plotly_white')"
+        ),
+        title="Churn rate by contract",
+    ),
+    Scenario(
+        question="Show monthly revenue by region.",
+        sql=(
+            "SELECT strftime(CAST(date AS DATE), '%Y-%m') AS month, region,\n"
+            "       SUM(revenue) AS revenue\n"
+            "FROM sales\n"
+            "GROUP BY month, region\n"
+            "ORDER BY month"
+        ),
+        code=(
+            "fig = px.line(df, x='month', y='revenue', color='region', markers=True)\n"
+            "fig.update_layout(template='plotly_white')"
+        ),
+        title="Monthly revenue by region",
+    ),
+    Scenario(
+        question="Compare average car price by fuel type and transmission.",
+        sql=(
+            'SELECT "Fuel Type" AS fuel_type, Transmission, AVG(Price) AS avg_price\n'
+            "FROM carpriceprediction\n"
+            'GROUP BY "Fuel Type", Transmission'
+        ),
+        code=(
+            "fig = px.bar(df, x='fuel_type', y='avg_price', color='Transmission', barmode='group')\n"
+            "fig.update_layout(template='plotly_white')"
+        ),
+        title="Average price by fuel type",
+    ),
+    Scenario(
+        question="Which tenure groups have the highest card balances?",
+        sql=(
+            "SELECT TENURE, COUNT(*) AS customers, AVG(BALANCE) AS avg_balance,\n"
+            "       AVG(CREDIT_LIMIT) AS avg_credit_limit\n"
+            "FROM ccgeneral\n"
+            "GROUP BY TENURE\n"
+            "ORDER BY avg_balance DESC"
+        ),
+        code="result = df.round(2)",
+        title="Balances by tenure",
+        result_type="table",
+    ),
+]
+
+_BY_QUESTION = {s.question: s for s in SCENARIOS}
+
+
+def scenario_for(question: str) -> Scenario:
+    """Return the scenario for a question, falling back to a stable pick."""
+    scenario = _BY_QUESTION.get(question)
+    if scenario is not None:
+        return scenario
+    return SCENARIOS[sum(map(ord, question)) % len(SCENARIOS)]
+
+
+def _turn_state(messages: list[ModelMessage]) -> tuple[str, int]:
+    """Return (question, step) for the current turn.
+
+    The step is the number of model responses already produced since the
+    most recent user prompt.
+    """
+    question = ""
+    step = 0
+    for message in messages:
+        if isinstance(message, ModelRequest):
+            prompts = [p for p in message.parts if isinstance(p, UserPromptPart)]
+            if prompts:
+                content = prompts[-1].content
+                question = content if isinstance(content, str) else str(content)
+                step = 0
+        elif isinstance(message, ModelResponse):
+            step += 1
+    return question, step
+
+
+def script_step(question: str, step: int) -> tuple[str, Union[ToolCallPart, None]]:
+    """Return the text and optional tool call for a given turn step."""
+    scenario = scenario_for(question)
+
+    if step == 0:
+        text = (
+            "<thinking>The user asks: "
+            f"{scenario.question} I will aggregate the relevant table with SQL "
+            "before charting anything.</thinking>"
+        )
+        call = ToolCallPart(
+            tool_name="query_data",
+            args={"sql": scenario.sql, "description": scenario.title},
+            tool_call_id=f"call_{uuid.uuid4().hex[:12]}",
+        )
+        return text, call
+
+    if step == 1:
+        text = (
+            "<thinking>The query returned the aggregated rows. A "
+            f"{scenario.result_type} is the clearest way to present them.</thinking>"
+        )
+        call = ToolCallPart(
+            tool_name="visualize",
+            args={
+                "code": scenario.code,
+                "title": scenario.title,
+                "result_type": scenario.result_type,
+                "description": scenario.title,
+            },
+            tool_call_id=f"call_{uuid.uuid4().hex[:12]}",
+        )
+        return text, call
+
+    text = (
+        "<thinking>Both tools succeeded; summarise the key insight.</thinking>"
+        f"Here is the {scenario.title.lower()}. The largest group stands out "
+        "clearly and the remaining groups follow a consistent pattern."
+    )
+    return text, None
+
+
+def chunk_text(text: str, size: int) -> list[str]:
+    """Split text into streamed deltas of `size` characters."""
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+def build_scripted_model(latency: float = 0.0, chunk_size: int = 4) -> FunctionModel:
+    """Build a FunctionModel replaying the scenarios.
+
+    Args:
+        latency: Seconds to wait before each model response, to emulate
+                 time-to-first-token of a real provider.
+        chunk_size: Characters per streamed text delta.
+    """
+
+    async def respond(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        if latency:
+            await asyncio.sleep(latency)
+        text, call = script_step(*_turn_state(messages))
+        parts: list = [TextPart(content=text)]
+        if call is not None:
+            parts.append(call)
+        return ModelResponse(parts=parts)
+
+    async def stream(
+        messages: list[ModelMessage], info: AgentInfo
+    ) -> AsyncIterator[Union[str, DeltaToolCalls]]:
+        if latency:
+            await asyncio.sleep(latency)
+        text, call = script_step(*_turn_state(messages))
+        for chunk in chunk_text(text, chunk_size):
+            yield chunk
+        if call is not None:
+            yield {
+                0: DeltaToolCall(
+                    name=call.tool_name,
+                    json_args=json.dumps(call.args),
+                    tool_call_id=call.tool_call_id,
+                )
+            }
+
+    return FunctionModel(respond, stream_function=stream, model_name="scripted")
@@ -6,13 +6,21 @@ Load CSV files from data/, ask questions, and get SQL queries + visualizations.
 
 Usage:
     python main.py
+    python main.py --batch questions.txt --output results.jsonl --concurrency 8
+    cat questions.txt | python main.py --batch - > results.jsonl
+
+Batch runs only resume with --output: rerunning with the same file skips
+questions it already answered. Results written to stdout always start over.
 """
 
+import argparse
 import asyncio
 import json
 import re
 import sys
+import time
 from pathlib import Path
+from typing import Any, Optional, TextIO
 
 import pandas as pd
 from dotenv import load_dotenv
@@ -20,7 +28,9 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from agent.agent import create_agent
-from agent.context import AgentContext
+from agent.context import AgentContext, DatasetSample
+from agent.ingest import dataset_name, read_dataset
+from agent.tools.approximate import build_samples
 
 # ---------------------------------------------------------------------------
 # ANSI colors for terminal output
@@ -48,9 +58,8 @@ def load_datasets(data_dir: str = "data") -> tuple[dict[str, pd.DataFrame], str]
     info_lines: list[str] = []
 
     for csv_file in sorted(data_path.glob("*.csv")):
-        # Sanitize name to be a valid SQL table name
-        name = re.sub(r"[^a-zA-Z0-9_]", "_", csv_file.stem).strip("_").lower()
-        df = pd.read_csv(csv_file)
+        name = dataset_name(csv_file)
+        df, _ = read_dataset(csv_file, name)
         datasets[name] = df
 
         cols = ", ".join(df.columns.tolist())
@@ -130,6 +139,171 @@ def display_messages(messages) -> None:
                     print(f"  {GREEN}> {content}{RESET}")
 
 
+# ---------------------------------------------------------------------------
+# Batch mode
+# ---------------------------------------------------------------------------
+def read_questions(source: str) -> list[str]:
+    """Read one question per line from a file, or stdin if source is '-'."""
+    lines = sys.stdin.readlines() if source == "-" else Path(source).read_text().splitlines()
+    return [line.strip() for line in lines if line.strip() and not line.startswith("#")]
+
+
+def read_completed(output: Optional[str]) -> set[tuple[int, str]]:
+    """Return (index, question) pairs already answered in a previous run.
+
+    Lines that aren't batch records are ignored.
+    """
+    if not output or not Path(output).exists():
+        return set()
+
+    completed: set[tuple[int, str]] = set()
+    for line in Path(output).read_text().splitlines():
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue  # Truncated last line from an interrupted run
+        if not isinstance(record, dict) or record.get("error") is not None:
+            continue
+        index, question = record.get("index"), record.get("question")
+        if isinstance(index, int) and isinstance(question, str):
+            completed.add((index, question))
+    return completed
+
+
+def summarize_run(messages) -> tuple[list[str], list[dict[str, str]], list[dict[str, Any]]]:
+    """Extract SQL queries, artifacts and tool timings from a run's messages."""
+    from pydantic_ai.messages import ModelRequest, ModelResponse, ToolCallPart, ToolReturnPart
+
+    sql: list[str] = []
+    artifacts: list[dict[str, str]] = []
+    tools: list[dict[str, Any]] = []
+    called_at: dict[str, Any] = {}
+
+    for msg in messages:
+        if isinstance(msg, ModelResponse):
+            for part in msg.parts:
+                if isinstance(part, ToolCallPart):
+                    called_at[part.tool_call_id] = msg.timestamp
+                    if part.tool_name == "query_data":
+                        sql.append(part.args_as_dict().get("sql", ""))
+
+        elif isinstance(msg, ModelRequest):
+            for part in msg.parts:
+                if isinstance(part, ToolReturnPart):
+                    content = str(part.content)
+                    started = called_at.get(part.tool_call_id)
+                    tools.append({
+                        "name": part.tool_name,
+                        "seconds": round((part.timestamp - started).total_seconds(), 3)
+                        if started else None,
+                        "success": not content.lower().startswith("error"),
+                    })
+                    match = re.search(r"Saved to: (output/\S+)", content)
+                    if match:
+                        artifacts.append({"tool": part.tool_name, "path": match.group(1)})
+
+    return sql, artifacts, tools
+
+
+async def answer_question(
+    agent,
+    datasets: dict[str, pd.DataFrame],
+    samples: dict[str, DatasetSample],
+    dataset_info: str,
+    index: int,
+    question: str,
+    output_dir: str = "output",
+) -> dict[str, Any]:
+    """Run one question in its own context and return its JSONL record."""
+    # Each question gets its own context; the DataFrames themselves are shared
+    context = AgentContext(
+        datasets=datasets.copy(),
+        dataset_info=dataset_info,
+        samples=samples,
+        output_dir=output_dir,
+    )
+    start = time.perf_counter()
+
+    try:
+        result = await agent.run(question, deps=context)
+    except Exception as e:
+        return {
+            "index": index,
+            "question": question,
+            "error": str(e),
+            "timings": {"total_s": round(time.perf_counter() - start, 3)},
+        }
+
+    thinking, answer = parse_thinking(result.output)
+    sql, artifacts, tools = summarize_run(result.new_messages())
+
+    return {
+        "index": index,
+        "question": question,
+        "answer": answer,
+        "thinking": thinking,
+        "sql": sql,
+        "artifacts": artifacts,
+        "timings": {
+            "total_s": round(time.perf_counter() - start, 3),
+            "tools": tools,
+        },
+        "error": None,
+    }
+
+
+async def run_batch(source: str, output: Optional[str], concurrency: int) -> None:
+    """Answer questions concurrently and stream results as JSONL."""
+    datasets, dataset_info = load_datasets()
+    if not datasets:
+        print(f"{RED}No CSV files found in data/.{RESET}", file=sys.stderr)
+        sys.exit(1)
+
+    questions = read_questions(source)
+    completed = read_completed(output)
+    pending = [
+        (index, question)
+        for index, question in enumerate(questions)
+        if (index, question) not in completed
+    ]
+    print(
+        f"{DIM}{len(questions)} questions, {len(questions) - len(pending)} already done, "
+        f"running {len(pending)} with concurrency {concurrency}{RESET}",
+        file=sys.stderr,
+    )
+
+    agent = create_agent(dataset_info)
+    samples = build_samples(datasets)
+    # Per-question directories, so questions producing the same chart title
+    # don't overwrite each other's files
+    batch_dir = Path("output") / (Path(output).stem if output else "batch")
+    semaphore = asyncio.Semaphore(concurrency)
+    sink: TextIO = open(output, "a") if output else sys.stdout
+    if output and sink.tell() and not Path(output).read_text().endswith("\n"):
+        sink.write("\n")  # Terminate a line truncated by an interrupted run
+
+    async def worker(index: int, question: str) -> None:
+        async with semaphore:
+            record = await answer_question(
+                agent, datasets, samples, dataset_info, index, question,
+                output_dir=str(batch_dir / f"{index:04d}"),
+            )
+        # Write each record as soon as it is ready so an interrupted run can resume
+        sink.write(json.dumps(record, default=str) + "\n")
+        sink.flush()
+        status = f"{RED}error{RESET}" if record["error"] else f"{GREEN}ok{RESET}"
+        print(
+            f"  [{index}] {status} {DIM}{record['timings']['total_s']}s{RESET} {question[:60]}",
+            file=sys.stderr,
+        )
+
+    try:
+        await asyncio.gather(*(worker(index, question) for index, question in pending))
+    finally:
+        if sink is not sys.stdout:
+            sink.close()
+
+
 # ---------------------------------------------------------------------------
 # Main loop
 # ---------------------------------------------------------------------------
@@ -150,7 +324,11 @@ async def main() -> None:
         print(f"  {DIM}Columns: {cols}{RESET}\n")
 
     agent = create_agent(dataset_info)
-    context = AgentContext(datasets=datasets, dataset_info=dataset_info)
+    context = AgentContext(
+        datasets=datasets,
+        dataset_info=dataset_info,
+        samples=build_samples(datasets),
+    )
     message_history = []
 
     print(f"Ask questions about your data. Type 'quit' to exit.\n")
@@ -198,5 +376,33 @@ async def main() -> None:
             print(f"\n{RED}Error:{RESET} {e}\n")
 
 
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Data Analysis Agent — CLI")
+    parser.add_argument(
+        "--batch",
+        metavar="FILE",
+        help="Answer questions from FILE (one per line, '-' for stdin) instead of chatting.",
+    )
+    parser.add_argument(
+        "--output",
+        metavar="FILE",
+        help=(
+            "Append JSONL results to FILE (default: stdout). Answered questions are "
+            "skipped on rerun; runs without --output can't resume."
+        ),
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Maximum number of questions running at once in batch mode.",
+    )
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    args = parse_args()
+    if args.batch:
+        asyncio.run(run_batch(args.batch, args.output, max(1, args.concurrency)))
+    else:
+        asyncio.run(main())
@@ -5,12 +5,14 @@ interface DataTableProps {
   rows: CellValue[][];
   totalRows: number;
   displayedRows: number;
+  /** 95% margins per column, shown as "value ± margin" */
+  margins?: Record<string, (number | null)[]>;
 }
 
 /**
  * Renders a data table with column headers and rows
  */
-export function DataTable({ columns, rows, totalRows, displayedRows }: DataTableProps) {
+export function DataTable({ columns, rows, totalRows, displayedRows, margins }: DataTableProps) {
   const formatCell = (value: CellValue): string => {
     if (value === null) return "—";
     if (typeof value === "boolean") return value ? "true" : "false";
@@ -22,6 +24,12 @@ export function DataTable({ columns, rows, totalRows, displayedRows }: DataTable
     return String(value);
   };
 
+  const formatMargin = (column: string, rowIndex: number): string => {
+    const margin = margins?.[column]?.[rowIndex];
+    if (margin === null || margin === undefined) return "";
+    return ` ± ${margin.toLocaleString(undefined, { maximumSignificantDigits: 2 })}`;
+  };
+
   return (
     <div className="data-table-container">
       <div className="data-table-header">
@@ -46,6 +54,7 @@ export function DataTable({ columns, rows, totalRows, displayedRows }: DataTable
                 {row.map((cell, cellIndex) => (
                   <td key={cellIndex} title={String(cell ?? "")}>
                     {formatCell(cell)}
+                    {formatMargin(columns[cellIndex], rowIndex)}
                   </td>
                 ))}
               </tr>
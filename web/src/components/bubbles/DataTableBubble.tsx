@@ -1,15 +1,22 @@
 import type { DataTableMessage } from "../../types/events";
 import { DataTable } from "./DataTable";
 
+function resultLabel({ approximate, refined }: DataTableMessage["metadata"]): string {
+  if (approximate) return "Query Results (approximate)";
+  if (refined) return "Query Results (exact)";
+  return "Query Results";
+}
+
 export function DataTableBubble({ message }: { message: DataTableMessage }) {
   return (
     <div className="message data-table">
-      <div className="label">Query Results</div>
+      <div className="label">{resultLabel(message.metadata)}</div>
       <DataTable
         columns={message.metadata.columns}
         rows={message.metadata.rows}
         totalRows={message.metadata.totalRows}
         displayedRows={message.metadata.displayedRows}
+        margins={message.metadata.approximate ? message.metadata.margins : undefined}
       />
     </div>
   );
@@ -40,6 +40,11 @@ export interface DataTableEvent {
   rows: CellValue[][];
   total_rows: number;
   displayed_rows: number;
+  call_id?: string;
+  approximate?: boolean;
+  refined?: boolean;
+  /** 95% margins of approximate values, per column and displayed row */
+  margins?: Record<string, (number | null)[]>;
 }
 
 export interface VisualizationEvent {
@@ -100,6 +105,10 @@ export interface DataTableMessage extends BaseMessage {
     rows: CellValue[][];
     totalRows: number;
     displayedRows: number;
+    callId?: string;
+    approximate?: boolean;
+    refined?: boolean;
+    margins?: Record<string, (number | null)[]>;
   };
 }
 
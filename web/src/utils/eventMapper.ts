@@ -105,6 +105,10 @@ export function createEventHandler(
             rows: d.rows,
             totalRows: d.total_rows,
             displayedRows: d.displayed_rows,
+            callId: d.call_id,
+            approximate: d.approximate,
+            refined: d.refined,
+            margins: d.margins,
           },
         });
         break;